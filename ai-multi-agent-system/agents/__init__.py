@@ -2,6 +2,7 @@
 from .classification_agent import get_classification_agent, ClassificationAgent
 from .task_creation_agent import get_task_creation_agent, TaskCreationAgent
 from .task_execution_agent import get_task_execution_agent, TaskExecutionAgent
+from .classify_and_create_agent import get_classify_and_create_agent, ClassifyAndCreateAgent
 
 __all__ = [
     "get_classification_agent",
@@ -10,4 +11,6 @@ __all__ = [
     "TaskCreationAgent",
     "get_task_execution_agent",
     "TaskExecutionAgent",
+    "get_classify_and_create_agent",
+    "ClassifyAndCreateAgent",
 ]
@@ -2,14 +2,113 @@
 Classification Agent
 Classifies incoming messages using Azure OpenAI LLM
 """
+import asyncio
+import copy
+import threading
+import orjson
 from crewai import Agent, Task
 from langchain_openai import AzureChatOpenAI
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from config.settings import settings
 from utils.logger import get_logger
+from utils.semantic_cache import SemanticCache
+from utils.text import preprocess_content
+from services.azure_batch_client import AzureBatchClient
+from .llm_client import get_async_llm, get_http_client, execute_task, build_system_prompt, build_chat_request, complete_json, parse_llm_json, stream_json_array
 
 logger = get_logger(__name__)
 
+TEMPERATURE = 0.3
+
+# Output description for CrewAI's expected_output on the sync paths
+CLASSIFICATION_OUTPUT_FORMAT = """JSON object with the following structure:
+{
+    "action_id": "string (e.g., 'policy_inquiry', 'claim_submission', 'update_details')",
+    "category": "string (e.g., 'inquiry', 'claim', 'complaint', 'update')",
+    "ivo_attributes": {
+        "customer_id": "string",
+        "policy_number": "string or null",
+        "issue_type": "string",
+        "priority": "string (low, medium, high, urgent)",
+        "required_action": "string",
+        "extracted_entities": {}
+    },
+    "confidence": float (0.0 to 1.0)
+}"""
+
+# JSON schema for the async and batch paths; enforced by the service instead of spelled out in the prompt
+CLASSIFICATION_SCHEMA = {
+    "name": "classification",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "action_id": {"type": "string", "description": "e.g. policy_inquiry, claim_submission, update_details"},
+            "category": {"type": "string", "description": "e.g. inquiry, claim, complaint, update"},
+            "ivo_attributes": {
+                "type": "object",
+                "properties": {
+                    "customer_id": {"type": "string"},
+                    "policy_number": {"type": ["string", "null"]},
+                    "issue_type": {"type": "string"},
+                    "priority": {"type": "string", "enum": ["low", "medium", "high", "urgent"]},
+                    "required_action": {"type": "string"},
+                    "extracted_entities": {"type": "object"}
+                },
+                "required": ["customer_id", "policy_number", "issue_type", "priority", "required_action", "extracted_entities"]
+            },
+            "confidence": {"type": "number", "minimum": 0, "maximum": 1}
+        },
+        "required": ["action_id", "category", "ivo_attributes", "confidence"]
+    }
+}
+
+MULTI_CLASSIFICATION_SCHEMA = {
+    "name": "classifications",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "classifications": {"type": "array", "items": CLASSIFICATION_SCHEMA["schema"]}
+        },
+        "required": ["classifications"]
+    }
+}
+
+# Upper bound on messages packed into one prompt, to stay well inside the context window
+MAX_MESSAGES_PER_PROMPT = 20
+
+# Fixed parts of the fallback classification; only the customer ID varies per message
+FALLBACK_CLASSIFICATION = {
+    "action_id": "general_inquiry",
+    "category": "inquiry",
+    "confidence": 0.5
+}
+
+FALLBACK_IVO_ATTRIBUTES = {
+    "policy_number": None,
+    "issue_type": "unclassified",
+    "priority": "medium",
+    "required_action": "manual_review"
+}
+
+CLASSIFICATION_GUIDELINES = """
+        Classification Guidelines:
+        1. Identify the primary intent and action required
+        2. Extract customer identifiers (ID, policy number, etc.)
+        3. Determine the issue type and category
+        4. Assess priority based on urgency indicators
+        5. Extract any mentioned entities (dates, amounts, names, etc.)
+        
+        Common Action IDs:
+        - policy_inquiry: Questions about existing policies
+        - claim_submission: New claim requests
+        - claim_status: Checking claim status
+        - policy_update: Updating policy details
+        - payment_inquiry: Payment-related questions
+        - complaint: Customer complaints
+        - general_inquiry: General questions
+        - document_request: Requesting documents
+"""
+
 
 class ClassificationAgent:
     """
@@ -19,7 +118,14 @@ class ClassificationAgent:
     
     def __init__(self):
         self.llm = self._initialize_llm()
+        self.allm = get_async_llm()
         self.agent = self._create_agent()
+        self.batch_client = AzureBatchClient(self.allm)
+        self.cache = SemanticCache(
+            threshold=settings.app.semantic_cache_threshold,
+            max_entries=settings.app.semantic_cache_size,
+            ttl=settings.app.prompt_cache_ttl
+        )
     
     def _initialize_llm(self) -> AzureChatOpenAI:
         """Initialize Azure OpenAI LLM"""
@@ -29,7 +135,9 @@ class ClassificationAgent:
             api_version=settings.azure_openai.api_version,
             deployment_name=settings.azure_openai.deployment_name,
             model=settings.azure_openai.model,
-            temperature=0.3
+            http_client=get_http_client(),
+            temperature=TEMPERATURE,
+            max_retries=0
         )
     
     def _create_agent(self) -> Agent:
@@ -67,91 +175,324 @@ class ClassificationAgent:
         try:
             logger.info(f"Classifying message from {message.get('channel', 'unknown')}")
             
+            cached = self._get_cached(message)
+            if cached is not None:
+                logger.info(f"Message classified from cache with action_id: {cached.get('action_id')}")
+                return cached
+            
             # Create classification task
             task = Task(
-                description=self._build_classification_prompt(message),
+                description=self.build_classification_prompt(message),
                 agent=self.agent,
-                expected_output="""JSON object with the following structure:
-                {
-                    "action_id": "string (e.g., 'policy_inquiry', 'claim_submission', 'update_details')",
-                    "category": "string (e.g., 'inquiry', 'claim', 'complaint', 'update')",
-                    "ivo_attributes": {
-                        "customer_id": "string",
-                        "policy_number": "string or null",
-                        "issue_type": "string",
-                        "priority": "string (low, medium, high, urgent)",
-                        "required_action": "string",
-                        "extracted_entities": {}
-                    },
-                    "confidence": float (0.0 to 1.0)
-                }"""
+                expected_output=CLASSIFICATION_OUTPUT_FORMAT
             )
             
             # Execute classification
-            result = task.execute()
+            result = parse_llm_json(execute_task(task))
+            self._put_cached(message, result)
             
             logger.info(f"Message classified successfully with action_id: {result.get('action_id')}")
             return result
             
         except Exception as e:
             logger.error(f"Error classifying message: {str(e)}")
-            return self._get_fallback_classification(message)
+            return self.get_fallback_classification(message)
+    
+    async def aclassify_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Classify a message without blocking the event loop
+        
+        Async counterpart of classify_message that calls Azure OpenAI directly,
+        so many messages can be classified concurrently.
+        
+        Args:
+            message: Dict containing message content and metadata
+        
+        Returns:
+            Classification dict with the same structure as classify_message
+        """
+        try:
+            logger.info(f"Classifying message from {message.get('channel', 'unknown')}")
+            
+            cached = self._get_cached(message)
+            if cached is not None:
+                logger.info(f"Message classified from cache with action_id: {cached.get('action_id')}")
+                return cached
+            
+            embedding = await self._embed_content(message)
+            if embedding is not None:
+                match = self.cache.search(embedding)
+                if match is not None:
+                    similar, similarity = match
+                    logger.info(f"Message classified from similar message ({similarity:.3f}) with action_id: {similar.get('action_id')}")
+                    return self._personalize_cached_classification(similar, message)
+            
+            result = await complete_json(
+                self.allm,
+                system_prompt=build_system_prompt(self.agent),
+                user_prompt=self.build_classification_prompt(message),
+                temperature=TEMPERATURE,
+                json_schema=CLASSIFICATION_SCHEMA
+            )
+            
+            self._put_cached(message, result)
+            if embedding is not None:
+                self.cache.add(embedding, copy.deepcopy(result))
+            
+            logger.info(f"Message classified successfully with action_id: {result.get('action_id')}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error classifying message: {str(e)}")
+            return self.get_fallback_classification(message)
+    
+    async def classify_batch(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Classify a bulk of messages through the Azure OpenAI Batch API
+        
+        Urgent messages are classified immediately with aclassify_message.
+        The rest are submitted as a single batch job, which avoids per-request
+        overhead and real-time rate limits but may take up to 24 hours.
+        
+        Args:
+            messages: List of message dicts (see classify_message)
+        
+        Returns:
+            List of classification dicts aligned with messages
+        """
+        urgent = [idx for idx, message in enumerate(messages) if self._is_urgent(message)]
+        deferred = [idx for idx, message in enumerate(messages) if not self._is_urgent(message)]
+        
+        logger.info(f"Classifying {len(messages)} messages ({len(urgent)} urgent, {len(deferred)} batched)")
+        
+        system_prompt = build_system_prompt(self.agent)
+        batch_requests = {
+            str(idx): build_chat_request(
+                system_prompt, self.build_classification_prompt(messages[idx]), TEMPERATURE, CLASSIFICATION_SCHEMA
+            )
+            for idx in deferred
+        }
+        
+        batch_job = asyncio.ensure_future(self.batch_client.run_chat_batch(batch_requests))
+        urgent_results = await asyncio.gather(*(self.aclassify_message(messages[idx]) for idx in urgent))
+        
+        try:
+            batch_outputs = await batch_job
+        except Exception as e:
+            logger.error(f"Error running classification batch: {str(e)}")
+            batch_outputs = {}
+        
+        results: List[Dict[str, Any]] = [None] * len(messages)
+        for idx, result in zip(urgent, urgent_results):
+            results[idx] = result
+        
+        for idx in deferred:
+            try:
+                results[idx] = orjson.loads(batch_outputs[str(idx)])
+            except Exception as e:
+                logger.error(f"No usable batch classification for message {messages[idx].get('message_id')}: {str(e)}")
+                results[idx] = self.get_fallback_classification(messages[idx])
+        
+        return results
+    
+    def _exact_cache_key(self, message: Dict[str, Any]) -> str:
+        """Build the exact-match cache key; includes the sender so results stay per customer"""
+        return f"{message.get('channel')}\n{message.get('sender')}\n{message.get('content', '')}"
+    
+    def _content_cache_key(self, message: Dict[str, Any]) -> str:
+        """Build the sender-independent cache key for content repeated across customers (FAQs, autoreplies)"""
+        return f"content\n{message.get('channel')}\n{message.get('content', '')}"
+    
+    def _get_cached(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached classification without calling the LLM or the embedding model
+        
+        A hit for the same sender and content is returned as-is; a hit for the same
+        content from another sender is personalized to this message first.
+        """
+        cached = self.cache.get_exact(self._exact_cache_key(message))
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        cached = self.cache.get_exact(self._content_cache_key(message))
+        if cached is not None:
+            return self._personalize_cached_classification(cached, message)
+        
+        return None
+    
+    def _put_cached(self, message: Dict[str, Any], result: Dict[str, Any]):
+        """Store a classification under both exact cache keys"""
+        stored = copy.deepcopy(result)
+        self.cache.put_exact(self._exact_cache_key(message), stored)
+        self.cache.put_exact(self._content_cache_key(message), stored)
+    
+    async def _embed_content(self, message: Dict[str, Any]) -> Optional[List[float]]:
+        """Embed the message content for similarity lookup; None when disabled or on error"""
+        content = message.get('content', '')
+        if not settings.azure_openai.embedding_deployment_name or not content.strip():
+            return None
+        
+        try:
+            response = await self.allm.embeddings.create(
+                model=settings.azure_openai.embedding_deployment_name,
+                input=content
+            )
+            return response.data[0].embedding
+        except Exception as e:
+            logger.warning(f"Error embedding message, skipping similarity cache: {str(e)}")
+            return None
     
-    def _build_classification_prompt(self, message: Dict[str, Any]) -> str:
+    def _personalize_cached_classification(self, cached: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Adapt a classification cached for a similar message to this message
+        
+        Intent fields (action, category, issue type, priority) are reused, but
+        identifiers extracted from the other message are reset so they never
+        leak across customers. Task creation sees the original content and
+        extracts them again.
+        """
+        result = copy.deepcopy(cached)
+        ivo_attributes = result.setdefault('ivo_attributes', {})
+        ivo_attributes['customer_id'] = message.get('sender', 'unknown')
+        ivo_attributes['policy_number'] = None
+        ivo_attributes['extracted_entities'] = {}
+        return result
+    
+    async def astream_classifications(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Classify several messages, yielding each classification as soon as it is available
+        
+        Cache hits are yielded first. The rest are streamed from one completion per
+        chunk, so callers can start working on early messages while the model is
+        still generating classifications for later ones.
+        
+        Args:
+            messages: List of message dicts (see classify_message)
+        
+        Yields:
+            (index into messages, classification dict), in completion order
+        """
+        misses = []
+        for idx, message in enumerate(messages):
+            cached = self._get_cached(message)
+            if cached is not None:
+                yield idx, cached
+            else:
+                misses.append(idx)
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        producers = [
+            asyncio.create_task(self._astream_chunk(misses[start:start + MAX_MESSAGES_PER_PROMPT], messages, queue))
+            for start in range(0, len(misses), MAX_MESSAGES_PER_PROMPT)
+        ]
+        
+        try:
+            for _ in misses:
+                yield await queue.get()
+        finally:
+            for producer in producers:
+                producer.cancel()
+    
+    async def _astream_chunk(self, indices: List[int], messages: List[Dict[str, Any]], queue: asyncio.Queue):
+        """Stream classifications for one chunk of messages into queue as (index, classification)"""
+        chunk = [messages[idx] for idx in indices]
+        received = 0
+        
+        try:
+            logger.info(f"Streaming classifications for {len(chunk)} messages in one request")
+            
+            async for classification in stream_json_array(
+                self.allm,
+                system_prompt=build_system_prompt(self.agent),
+                user_prompt=self._build_multi_classification_prompt(chunk),
+                temperature=TEMPERATURE,
+                key='classifications',
+                json_schema=MULTI_CLASSIFICATION_SCHEMA
+            ):
+                if received == len(indices):
+                    break
+                
+                idx = indices[received]
+                received += 1
+                
+                if isinstance(classification, dict):
+                    self._put_cached(messages[idx], classification)
+                else:
+                    classification = self.get_fallback_classification(messages[idx])
+                queue.put_nowait((idx, classification))
+            
+        except Exception as e:
+            logger.error(f"Error streaming classifications: {str(e)}")
+        
+        # Classify anything the stream didn't cover one by one
+        if received < len(indices):
+            logger.warning(f"Expected {len(indices)} classifications, got {received}")
+            remaining = indices[received:]
+            results = await asyncio.gather(*(self.aclassify_message(messages[idx]) for idx in remaining))
+            for idx, classification in zip(remaining, results):
+                queue.put_nowait((idx, classification))
+    
+    def _is_urgent(self, message: Dict[str, Any]) -> bool:
+        """Check whether a message is tagged urgent and needs real-time classification"""
+        metadata = message.get('metadata') or {}
+        return bool(metadata.get('urgent')) or metadata.get('priority') == 'urgent'
+    
+    def build_classification_prompt(self, message: Dict[str, Any]) -> str:
         """Build the classification prompt for the LLM"""
         return f"""
         Analyze the following message and classify it into an appropriate action category.
         Extract all relevant attributes for task processing.
         
         Message Details:
-        - Channel: {message.get('channel', 'unknown')}
-        - Sender: {message.get('sender', 'unknown')}
-        - Timestamp: {message.get('timestamp', 'unknown')}
-        - Content: {message.get('content', '')}
-        
-        Classification Guidelines:
-        1. Identify the primary intent and action required
-        2. Extract customer identifiers (ID, policy number, etc.)
-        3. Determine the issue type and category
-        4. Assess priority based on urgency indicators
-        5. Extract any mentioned entities (dates, amounts, names, etc.)
+{self._format_message_details(message)}
+        {CLASSIFICATION_GUIDELINES}
+        Return a structured JSON classification with all extracted information.
+        """
+    
+    def _build_multi_classification_prompt(self, messages: List[Dict[str, Any]]) -> str:
+        """Build one classification prompt covering several numbered messages"""
+        numbered_messages = "\n".join(
+            f"        Message {number}:\n{self._format_message_details(message)}"
+            for number, message in enumerate(messages, start=1)
+        )
         
-        Common Action IDs:
-        - policy_inquiry: Questions about existing policies
-        - claim_submission: New claim requests
-        - claim_status: Checking claim status
-        - policy_update: Updating policy details
-        - payment_inquiry: Payment-related questions
-        - complaint: Customer complaints
-        - general_inquiry: General questions
-        - document_request: Requesting documents
+        return f"""
+        Analyze each of the following {len(messages)} messages independently and classify each
+        into an appropriate action category. Extract all relevant attributes for task processing.
         
-        Return a structured JSON classification with all extracted information.
+{numbered_messages}
+        {CLASSIFICATION_GUIDELINES}
+        Return one structured JSON classification per message, in message order.
         """
     
-    def _get_fallback_classification(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    def _format_message_details(self, message: Dict[str, Any]) -> str:
+        """Format the message fields included in classification prompts"""
+        return f"""        - Channel: {message.get('channel', 'unknown')}
+        - Sender: {message.get('sender', 'unknown')}
+        - Timestamp: {message.get('timestamp', 'unknown')}
+        - Content: {preprocess_content(message.get('content', ''), settings.app.prompt_content_max_chars)}"""
+    
+    def get_fallback_classification(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Provide fallback classification if LLM fails"""
         return {
-            "action_id": "general_inquiry",
-            "category": "inquiry",
+            **FALLBACK_CLASSIFICATION,
             "ivo_attributes": {
+                **FALLBACK_IVO_ATTRIBUTES,
                 "customer_id": message.get('sender', 'unknown'),
-                "policy_number": None,
-                "issue_type": "unclassified",
-                "priority": "medium",
-                "required_action": "manual_review",
                 "extracted_entities": {}
-            },
-            "confidence": 0.5
+            }
         }
 
 
 # Singleton instance
 _classification_agent = None
+_classification_agent_lock = threading.Lock()
 
 def get_classification_agent() -> ClassificationAgent:
     """Get or create classification agent singleton"""
     global _classification_agent
     if _classification_agent is None:
-        _classification_agent = ClassificationAgent()
+        with _classification_agent_lock:
+            if _classification_agent is None:
+                _classification_agent = ClassificationAgent()
     return _classification_agent
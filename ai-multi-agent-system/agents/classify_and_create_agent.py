@@ -0,0 +1,100 @@
+"""
+Classify and Create Agent
+Classifies a message and creates its task in a single Azure OpenAI call
+"""
+import threading
+from typing import Dict, Any, Tuple
+from utils.logger import get_logger
+from .classification_agent import get_classification_agent, CLASSIFICATION_SCHEMA
+from .task_creation_agent import get_task_creation_agent, TASK_SCHEMA, TASK_CREATION_GUIDELINES
+from .llm_client import get_async_llm, build_system_prompt, complete_json
+
+logger = get_logger(__name__)
+
+TEMPERATURE = 0.2
+
+FUSED_SCHEMA = {
+    "name": "classification_and_task",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "classification": CLASSIFICATION_SCHEMA["schema"],
+            "task": TASK_SCHEMA["schema"]
+        },
+        "required": ["classification", "task"]
+    }
+}
+
+
+class ClassifyAndCreateAgent:
+    """
+    Agent that fuses classification and task creation into one LLM call
+    Saves one Azure round trip and one copy of the shared message context per message;
+    ClassificationAgent and TaskCreationAgent remain available for single-stage callers.
+    """
+    
+    def __init__(self):
+        self.classification_agent = get_classification_agent()
+        self.task_creation_agent = get_task_creation_agent()
+        self.allm = get_async_llm()
+        self.system_prompt = "\n\n".join([
+            build_system_prompt(self.classification_agent.agent),
+            build_system_prompt(self.task_creation_agent.agent)
+        ])
+    
+    async def aclassify_and_create(self, message: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Classify a message and create its executable task
+        
+        Args:
+            message: Dict containing message content and metadata
+        
+        Returns:
+            Tuple of (classification, task) with the same structures as
+            ClassificationAgent.classify_message and TaskCreationAgent.create_task
+        """
+        try:
+            logger.info(f"Classifying and creating task for message from {message.get('channel', 'unknown')}")
+            
+            result = await complete_json(
+                self.allm,
+                system_prompt=self.system_prompt,
+                user_prompt=self._build_prompt(message),
+                temperature=TEMPERATURE,
+                json_schema=FUSED_SCHEMA
+            )
+            classification, task = result['classification'], result['task']
+            
+            logger.info(f"Message classified with action_id: {classification.get('action_id')}, task_id: {task.get('task_id')}")
+            return classification, task
+            
+        except Exception as e:
+            logger.error(f"Error classifying and creating task: {str(e)}")
+            classification = self.classification_agent.get_fallback_classification(message)
+            return classification, self.task_creation_agent.get_fallback_task(classification, message)
+    
+    def _build_prompt(self, message: Dict[str, Any]) -> str:
+        """Build the fused prompt: classification first, then task creation from that classification"""
+        return f"""{self.classification_agent.build_classification_prompt(message)}
+        Then create a structured, executable task based on your classification and the message.
+        - Message ID: {message.get('message_id')}
+        {TASK_CREATION_GUIDELINES}
+        Ensure the IVO JSON is properly formatted and contains all necessary fields
+        for successful API execution.
+        
+        Return a JSON object with the classification under "classification" and the task under "task".
+        """
+
+
+# Singleton instance
+_classify_and_create_agent = None
+_classify_and_create_agent_lock = threading.Lock()
+
+def get_classify_and_create_agent() -> ClassifyAndCreateAgent:
+    """Get or create classify-and-create agent singleton"""
+    global _classify_and_create_agent
+    if _classify_and_create_agent is None:
+        with _classify_and_create_agent_lock:
+            if _classify_and_create_agent is None:
+                _classify_and_create_agent = ClassifyAndCreateAgent()
+    return _classify_and_create_agent
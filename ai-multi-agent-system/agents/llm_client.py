@@ -0,0 +1,253 @@
+"""
+LLM Client
+Async Azure OpenAI client and JSON completion helpers shared by the agents
+"""
+import asyncio
+import threading
+from typing import Dict, Any, AsyncIterator, Optional, Union
+import httpx
+import orjson
+from aiolimiter import AsyncLimiter
+from crewai import Agent, Task
+from openai import (
+    AsyncAzureOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+from config.settings import settings
+from utils.logger import get_logger
+from utils.json_stream import JSONArrayStreamParser
+
+logger = get_logger(__name__)
+
+# Errors worth retrying: 429s, timeouts, dropped connections and 5xx responses
+TRANSIENT_LLM_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+llm_retry = retry(
+    wait=wait_exponential_jitter(initial=1, max=30),
+    stop=stop_after_attempt(settings.app.max_retries if settings.app.enable_retry else 1),
+    retry=retry_if_exception_type(TRANSIENT_LLM_ERRORS),
+    before_sleep=lambda state: logger.warning(
+        "Transient LLM error, retrying (attempt {}): {}", state.attempt_number, state.outcome.exception()
+    ),
+    reraise=True
+)
+
+
+# Client-side ceiling on request rate and in-flight requests for the chat deployment,
+# so bursts wait here instead of turning into 429s
+_llm_limiter = AsyncLimiter(settings.azure_openai.rpm, 60)
+_llm_semaphore = asyncio.Semaphore(settings.azure_openai.max_concurrency)
+
+# Connection pool limits for the HTTP clients shared by all agents
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+
+
+def create_async_llm(http_client: Optional[httpx.AsyncClient] = None) -> AsyncAzureOpenAI:
+    """Create an async Azure OpenAI client (retries are handled by llm_retry)"""
+    return AsyncAzureOpenAI(
+        azure_endpoint=settings.azure_openai.endpoint,
+        api_key=settings.azure_openai.api_key,
+        api_version=settings.azure_openai.api_version,
+        max_retries=0,
+        http_client=http_client
+    )
+
+
+# Shared client instances
+_async_llm = None
+_http_client = None
+_client_lock = threading.Lock()
+
+def get_async_llm() -> AsyncAzureOpenAI:
+    """Get or create the async Azure OpenAI client shared by all agents"""
+    global _async_llm
+    if _async_llm is None:
+        with _client_lock:
+            if _async_llm is None:
+                _async_llm = create_async_llm(httpx.AsyncClient(limits=HTTP_LIMITS))
+    return _async_llm
+
+
+def get_http_client() -> httpx.Client:
+    """Get or create the sync HTTP client shared by the agents' CrewAI LLMs"""
+    global _http_client
+    if _http_client is None:
+        with _client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(limits=HTTP_LIMITS)
+    return _http_client
+
+
+@llm_retry
+def execute_task(task: Task) -> Any:
+    """Execute a CrewAI task, retrying transient Azure OpenAI errors"""
+    return task.execute()
+
+
+def build_system_prompt(agent: Agent) -> str:
+    """Build a system prompt from a CrewAI agent's role, goal and backstory"""
+    return f"You are a {agent.role}. Your goal: {agent.goal}\n{agent.backstory}"
+
+
+def parse_llm_json(raw: Union[str, Dict[str, Any], list]) -> Any:
+    """Parse LLM output into JSON, tolerating markdown code fences around it"""
+    if not isinstance(raw, str):
+        return raw
+    
+    text = raw.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    
+    return orjson.loads(text)
+
+
+def build_response_format(json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the response_format for a chat completion
+    
+    Args:
+        json_schema: Optional {"name": ..., "schema": ...} definition; when given the
+            server enforces the schema, so the prompt doesn't need to describe it
+    
+    Returns:
+        Structured-output response_format, or plain JSON mode without a schema
+    """
+    if json_schema is None:
+        return {"type": "json_object"}
+    
+    return {"type": "json_schema", "json_schema": {**json_schema, "strict": False}}
+
+
+def build_chat_request(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Build the body of a JSON chat completion request (without the model)"""
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": temperature,
+        "response_format": build_response_format(json_schema)
+    }
+
+
+@llm_retry
+async def complete_text(
+    client: AsyncAzureOpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float
+) -> str:
+    """
+    Run a chat completion and return its plain-text reply
+
+    Each attempt waits for a slot under the deployment's rate and concurrency limits.
+
+    Args:
+        client: Async Azure OpenAI client
+        system_prompt: System message describing the agent
+        user_prompt: User message with the task prompt
+        temperature: Sampling temperature
+
+    Returns:
+        Text of the completion
+    """
+    async with _llm_limiter, _llm_semaphore:
+        response = await client.chat.completions.create(
+            model=settings.azure_openai.deployment_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature
+        )
+    return response.choices[0].message.content
+
+
+@llm_retry
+async def complete_json(
+    client: AsyncAzureOpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run a chat completion and parse the JSON object it returns
+
+    Each attempt waits for a slot under the deployment's rate and concurrency limits.
+
+    Args:
+        client: Async Azure OpenAI client
+        system_prompt: System message describing the agent
+        user_prompt: User message with the task prompt
+        temperature: Sampling temperature
+        json_schema: Optional JSON schema the response must follow
+
+    Returns:
+        Parsed JSON object from the completion
+    """
+    async with _llm_limiter, _llm_semaphore:
+        response = await client.chat.completions.create(
+            model=settings.azure_openai.deployment_name,
+            **build_chat_request(system_prompt, user_prompt, temperature, json_schema)
+        )
+    return orjson.loads(response.choices[0].message.content)
+
+
+async def stream_json_array(
+    client: AsyncAzureOpenAI,
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float,
+    key: str,
+    json_schema: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Any]:
+    """
+    Stream a chat completion and yield the items of its JSON array field as they complete
+
+    Lets callers start on the first items while the model is still generating the
+    rest. The rate and concurrency limits apply to opening the stream, not to
+    reading it. Not retried; callers handle items missing after a failure.
+
+    Args:
+        client: Async Azure OpenAI client
+        system_prompt: System message describing the agent
+        user_prompt: User message with the task prompt
+        temperature: Sampling temperature
+        key: Name of the array field in the output JSON object
+        json_schema: Optional JSON schema the response must follow
+
+    Yields:
+        Parsed array items, in order
+    """
+    parser = JSONArrayStreamParser(key)
+    
+    # The slot covers opening the stream only, so a slow consumer doesn't pin an
+    # LLM concurrency slot while it processes the yielded items
+    async with _llm_limiter, _llm_semaphore:
+        stream = await client.chat.completions.create(
+            model=settings.azure_openai.deployment_name,
+            stream=True,
+            **build_chat_request(system_prompt, user_prompt, temperature, json_schema)
+        )
+    
+    try:
+        async for chunk in stream:
+            # Azure sends content filter results in chunks without choices
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            
+            for item in parser.feed(chunk.choices[0].delta.content):
+                yield item
+    finally:
+        # Release the connection when the caller stops early
+        await stream.close()
@@ -2,14 +2,149 @@
 Task Creation Agent
 Converts classification results into actionable tasks and IVO JSON format
 """
+import asyncio
+import copy
+import threading
+import uuid
+import orjson
+from datetime import datetime
 from crewai import Agent, Task
 from langchain_openai import AzureChatOpenAI
-from typing import Dict, Any
+from typing import Dict, Any, List
 from config.settings import settings
 from utils.logger import get_logger
+from utils.cache import LRUCache, prompt_key
+from utils.text import preprocess_content
+from services.azure_batch_client import AzureBatchClient
+from .llm_client import get_async_llm, get_http_client, execute_task, build_system_prompt, build_chat_request, complete_json, parse_llm_json
 
 logger = get_logger(__name__)
 
+TEMPERATURE = 0.2
+
+# Output description for CrewAI's expected_output on the sync paths
+TASK_OUTPUT_FORMAT = """JSON object with the following structure:
+{
+    "task_id": "string (UUID format)",
+    "action_type": "string (matches action_id from classification)",
+    "ivo_json": {
+        "action_id": "string",
+        "request_type": "string",
+        "customer_data": {
+            "customer_id": "string",
+            "policy_number": "string or null",
+            "contact_info": {}
+        },
+        "action_parameters": {
+            "issue_type": "string",
+            "priority": "string",
+            "details": {},
+            "attachments": []
+        },
+        "metadata": {
+            "source_channel": "string",
+            "timestamp": "string",
+            "original_message_id": "string"
+        }
+    },
+    "execution_params": {
+        "api_endpoint": "string",
+        "http_method": "string",
+        "timeout": integer,
+        "retry_strategy": {}
+    },
+    "metadata": {
+        "created_at": "string",
+        "classification_confidence": float,
+        "estimated_completion_time": "string"
+    }
+}"""
+
+# JSON schema for the async and batch paths; enforced by the service instead of spelled out in the prompt
+TASK_SCHEMA = {
+    "name": "task",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "task_id": {"type": "string", "description": "UUID"},
+            "action_type": {"type": "string", "description": "matches action_id from classification"},
+            "ivo_json": {
+                "type": "object",
+                "properties": {
+                    "action_id": {"type": "string"},
+                    "request_type": {"type": "string"},
+                    "customer_data": {
+                        "type": "object",
+                        "properties": {
+                            "customer_id": {"type": "string"},
+                            "policy_number": {"type": ["string", "null"]},
+                            "contact_info": {"type": "object"}
+                        },
+                        "required": ["customer_id", "policy_number", "contact_info"]
+                    },
+                    "action_parameters": {
+                        "type": "object",
+                        "properties": {
+                            "issue_type": {"type": "string"},
+                            "priority": {"type": "string"},
+                            "details": {"type": "object"},
+                            "attachments": {"type": "array"}
+                        },
+                        "required": ["issue_type", "priority", "details", "attachments"]
+                    },
+                    "metadata": {
+                        "type": "object",
+                        "properties": {
+                            "source_channel": {"type": "string"},
+                            "timestamp": {"type": "string"},
+                            "original_message_id": {"type": "string"}
+                        },
+                        "required": ["source_channel", "timestamp", "original_message_id"]
+                    }
+                },
+                "required": ["action_id", "request_type", "customer_data", "action_parameters", "metadata"]
+            },
+            "execution_params": {
+                "type": "object",
+                "properties": {
+                    "api_endpoint": {"type": "string"},
+                    "http_method": {"type": "string"},
+                    "timeout": {"type": "integer"},
+                    "retry_strategy": {"type": "object"}
+                },
+                "required": ["api_endpoint", "http_method", "timeout", "retry_strategy"]
+            },
+            "metadata": {
+                "type": "object",
+                "properties": {
+                    "created_at": {"type": "string"},
+                    "classification_confidence": {"type": "number"},
+                    "estimated_completion_time": {"type": "string"}
+                },
+                "required": ["created_at", "classification_confidence", "estimated_completion_time"]
+            }
+        },
+        "required": ["task_id", "action_type", "ivo_json", "execution_params", "metadata"]
+    }
+}
+
+TASK_CREATION_GUIDELINES = """
+        Task Creation Guidelines:
+        1. Generate a unique task_id (UUID format)
+        2. Map action_id to appropriate IDIT API endpoint
+        3. Structure IVO JSON according to IDIT API specification
+        4. Include all relevant customer data and parameters
+        5. Set appropriate execution parameters (endpoint, method, timeout)
+        6. Add comprehensive metadata for tracking and auditing
+        
+        API Endpoint Mapping:
+        - policy_inquiry -> /api/v1/policies/inquiry
+        - claim_submission -> /api/v1/claims/submit
+        - claim_status -> /api/v1/claims/status
+        - policy_update -> /api/v1/policies/update
+        - payment_inquiry -> /api/v1/payments/inquiry
+"""
+
 
 class TaskCreationAgent:
     """
@@ -19,7 +154,10 @@ class TaskCreationAgent:
     
     def __init__(self):
         self.llm = self._initialize_llm()
+        self.allm = get_async_llm()
         self.agent = self._create_agent()
+        self.batch_client = AzureBatchClient(self.allm)
+        self.cache = LRUCache(maxsize=settings.app.prompt_cache_size, ttl=settings.app.prompt_cache_ttl)
     
     def _initialize_llm(self) -> AzureChatOpenAI:
         """Initialize Azure OpenAI LLM"""
@@ -29,7 +167,9 @@ class TaskCreationAgent:
             api_version=settings.azure_openai.api_version,
             deployment_name=settings.azure_openai.deployment_name,
             model=settings.azure_openai.model,
-            temperature=0.2
+            http_client=get_http_client(),
+            temperature=TEMPERATURE,
+            max_retries=0
         )
     
     def _create_agent(self) -> Agent:
@@ -64,57 +204,152 @@ class TaskCreationAgent:
         try:
             logger.info(f"Creating task for action_id: {classification.get('action_id')}")
             
+            cache_key = self._cache_key(classification, message)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached, message)
+            
             # Create task generation task
             task = Task(
                 description=self._build_task_creation_prompt(classification, message),
                 agent=self.agent,
-                expected_output="""JSON object with the following structure:
-                {
-                    "task_id": "string (UUID format)",
-                    "action_type": "string (matches action_id from classification)",
-                    "ivo_json": {
-                        "action_id": "string",
-                        "request_type": "string",
-                        "customer_data": {
-                            "customer_id": "string",
-                            "policy_number": "string or null",
-                            "contact_info": {}
-                        },
-                        "action_parameters": {
-                            "issue_type": "string",
-                            "priority": "string",
-                            "details": {},
-                            "attachments": []
-                        },
-                        "metadata": {
-                            "source_channel": "string",
-                            "timestamp": "string",
-                            "original_message_id": "string"
-                        }
-                    },
-                    "execution_params": {
-                        "api_endpoint": "string",
-                        "http_method": "string",
-                        "timeout": integer,
-                        "retry_strategy": {}
-                    },
-                    "metadata": {
-                        "created_at": "string",
-                        "classification_confidence": float,
-                        "estimated_completion_time": "string"
-                    }
-                }"""
+                expected_output=TASK_OUTPUT_FORMAT
             )
             
             # Execute task creation
-            result = task.execute()
+            result = parse_llm_json(execute_task(task))
+            self.cache.set(cache_key, copy.deepcopy(result))
             
             logger.info(f"Task created successfully with task_id: {result.get('task_id')}")
             return result
             
         except Exception as e:
             logger.error(f"Error creating task: {str(e)}")
-            return self._get_fallback_task(classification, message)
+            return self.get_fallback_task(classification, message)
+    
+    async def acreate_task(self, classification: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Create an executable task without blocking the event loop
+        
+        Async counterpart of create_task that calls Azure OpenAI directly,
+        so task creation for many messages can run concurrently.
+        
+        Args:
+            classification: Classification result from ClassificationAgent
+            message: Original message data
+        
+        Returns:
+            Task dict with the same structure as create_task
+        """
+        try:
+            logger.info(f"Creating task for action_id: {classification.get('action_id')}")
+            
+            cache_key = self._cache_key(classification, message)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return self._from_cache(cached, message)
+            
+            result = await complete_json(
+                self.allm,
+                system_prompt=build_system_prompt(self.agent),
+                user_prompt=self._build_task_creation_prompt(classification, message),
+                temperature=TEMPERATURE,
+                json_schema=TASK_SCHEMA
+            )
+            self.cache.set(cache_key, copy.deepcopy(result))
+            
+            logger.info(f"Task created successfully with task_id: {result.get('task_id')}")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error creating task: {str(e)}")
+            return self.get_fallback_task(classification, message)
+    
+    def _cache_key(self, classification: Dict[str, Any], message: Dict[str, Any]) -> str:
+        """
+        Hash the rendered task creation prompt into a cache key
+        
+        The message ID is left out of the rendered prompt so repeats of the
+        same request hit the cache; per-message identifiers are regenerated
+        on every hit by _from_cache.
+        """
+        return prompt_key(self._build_task_creation_prompt(classification, {**message, 'message_id': None}))
+    
+    def _from_cache(self, cached: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a cached task and give it fresh per-message identifiers"""
+        task = copy.deepcopy(cached)
+        now = datetime.utcnow().isoformat()
+        
+        task['task_id'] = str(uuid.uuid4())
+        task.setdefault('metadata', {})['created_at'] = now
+        
+        ivo_metadata = task.setdefault('ivo_json', {}).setdefault('metadata', {})
+        ivo_metadata['timestamp'] = now
+        ivo_metadata['original_message_id'] = message.get('message_id', 'unknown')
+        
+        logger.info(f"Task created from cache with task_id: {task['task_id']}")
+        return task
+    
+    async def create_task_batch(
+        self,
+        classifications: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Create tasks for a bulk of messages through the Azure OpenAI Batch API
+        
+        Urgent items are created immediately with acreate_task. The rest are
+        submitted as a single batch job, which avoids per-request overhead and
+        real-time rate limits but may take up to 24 hours.
+        
+        Args:
+            classifications: Classification results from ClassificationAgent
+            messages: Original messages, aligned with classifications
+        
+        Returns:
+            List of task dicts aligned with messages
+        """
+        pairs = list(zip(classifications, messages))
+        urgent = [idx for idx, pair in enumerate(pairs) if self._is_urgent(*pair)]
+        deferred = [idx for idx, pair in enumerate(pairs) if not self._is_urgent(*pair)]
+        
+        logger.info(f"Creating {len(pairs)} tasks ({len(urgent)} urgent, {len(deferred)} batched)")
+        
+        system_prompt = build_system_prompt(self.agent)
+        batch_requests = {
+            str(idx): build_chat_request(
+                system_prompt, self._build_task_creation_prompt(*pairs[idx]), TEMPERATURE, TASK_SCHEMA
+            )
+            for idx in deferred
+        }
+        
+        batch_job = asyncio.ensure_future(self.batch_client.run_chat_batch(batch_requests))
+        urgent_results = await asyncio.gather(*(self.acreate_task(*pairs[idx]) for idx in urgent))
+        
+        try:
+            batch_outputs = await batch_job
+        except Exception as e:
+            logger.error(f"Error running task creation batch: {str(e)}")
+            batch_outputs = {}
+        
+        results: List[Dict[str, Any]] = [None] * len(pairs)
+        for idx, result in zip(urgent, urgent_results):
+            results[idx] = result
+        
+        for idx in deferred:
+            try:
+                results[idx] = orjson.loads(batch_outputs[str(idx)])
+            except Exception as e:
+                logger.error(f"No usable batch task for message {messages[idx].get('message_id')}: {str(e)}")
+                results[idx] = self.get_fallback_task(*pairs[idx])
+        
+        return results
+    
+    def _is_urgent(self, classification: Dict[str, Any], message: Dict[str, Any]) -> bool:
+        """Check whether a classified message is urgent and needs real-time task creation"""
+        metadata = message.get('metadata') or {}
+        priority = (classification.get('ivo_attributes') or {}).get('priority')
+        return bool(metadata.get('urgent')) or 'urgent' in (priority, metadata.get('priority'))
     
     def _build_task_creation_prompt(self, classification: Dict[str, Any], message: Dict[str, Any]) -> str:
         """Build the task creation prompt for the LLM"""
@@ -130,33 +365,15 @@ class TaskCreationAgent:
         Original Message:
         - Channel: {message.get('channel')}
         - Sender: {message.get('sender')}
-        - Content: {message.get('content')}
+        - Content: {preprocess_content(message.get('content'), settings.app.prompt_content_max_chars)}
         - Message ID: {message.get('message_id')}
-        
-        Task Creation Guidelines:
-        1. Generate a unique task_id (UUID format)
-        2. Map action_id to appropriate IDIT API endpoint
-        3. Structure IVO JSON according to IDIT API specification
-        4. Include all relevant customer data and parameters
-        5. Set appropriate execution parameters (endpoint, method, timeout)
-        6. Add comprehensive metadata for tracking and auditing
-        
-        API Endpoint Mapping:
-        - policy_inquiry -> /api/v1/policies/inquiry
-        - claim_submission -> /api/v1/claims/submit
-        - claim_status -> /api/v1/claims/status
-        - policy_update -> /api/v1/policies/update
-        - payment_inquiry -> /api/v1/payments/inquiry
-        
+        {TASK_CREATION_GUIDELINES}
         Ensure the IVO JSON is properly formatted and contains all necessary fields
         for successful API execution.
         """
     
-    def _get_fallback_task(self, classification: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
+    def get_fallback_task(self, classification: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
         """Provide fallback task if LLM fails"""
-        import uuid
-        from datetime import datetime
-        
         return {
             "task_id": str(uuid.uuid4()),
             "action_type": classification.get('action_id', 'general_inquiry'),
@@ -191,10 +408,13 @@ class TaskCreationAgent:
 
 # Singleton instance
 _task_creation_agent = None
+_task_creation_agent_lock = threading.Lock()
 
 def get_task_creation_agent() -> TaskCreationAgent:
     """Get or create task creation agent singleton"""
     global _task_creation_agent
     if _task_creation_agent is None:
-        _task_creation_agent = TaskCreationAgent()
+        with _task_creation_agent_lock:
+            if _task_creation_agent is None:
+                _task_creation_agent = TaskCreationAgent()
     return _task_creation_agent
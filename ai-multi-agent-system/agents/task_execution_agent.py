@@ -2,15 +2,28 @@
 Task Execution Agent
 Executes tasks by calling IDIT API and manages response handling
 """
-from crewai import Agent, Task
+import threading
+from crewai import Agent
 from langchain_openai import AzureChatOpenAI
 from typing import Dict, Any, Optional
 from config.settings import settings
 from utils.logger import get_logger
 from services.idit_api_client import get_idit_client
+from .llm_client import get_async_llm, get_http_client, build_system_prompt, complete_text
 
 logger = get_logger(__name__)
 
+TEMPERATURE = 0.4
+
+# What the generated reply should look like; appended to the response prompt
+RESPONSE_GUIDELINES = """The reply must be a clear, concise, and friendly message to send back to the user.
+        The message should:
+        1. Acknowledge their request
+        2. Provide the result or status
+        3. Include relevant details (confirmation numbers, next steps, etc.)
+        4. Be appropriate for the channel (formal for email, casual for WhatsApp)
+        5. End with helpful information or call-to-action if needed"""
+
 
 class TaskExecutionAgent:
     """
@@ -20,6 +33,7 @@ class TaskExecutionAgent:
     
     def __init__(self):
         self.llm = self._initialize_llm()
+        self.allm = get_async_llm()
         self.agent = self._create_agent()
         self.idit_client = get_idit_client()
     
@@ -31,7 +45,8 @@ class TaskExecutionAgent:
             api_version=settings.azure_openai.api_version,
             deployment_name=settings.azure_openai.deployment_name,
             model=settings.azure_openai.model,
-            temperature=0.4
+            http_client=get_http_client(),
+            temperature=TEMPERATURE
         )
     
     def _create_agent(self) -> Agent:
@@ -123,22 +138,14 @@ class TaskExecutionAgent:
     ) -> str:
         """Generate user-friendly response using LLM"""
         try:
-            # Create response generation task
-            task = Task(
-                description=self._build_response_prompt(task_data, api_response, message),
-                agent=self.agent,
-                expected_output="""A clear, concise, and friendly message to send back to the user.
-                The message should:
-                1. Acknowledge their request
-                2. Provide the result or status
-                3. Include relevant details (confirmation numbers, next steps, etc.)
-                4. Be appropriate for the channel (formal for email, casual for WhatsApp)
-                5. End with helpful information or call-to-action if needed"""
+            # Awaited on the event loop; no blocking CrewAI call per message
+            response_text = await complete_text(
+                self.allm,
+                system_prompt=build_system_prompt(self.agent),
+                user_prompt=self._build_response_prompt(task_data, api_response, message),
+                temperature=TEMPERATURE
             )
             
-            # Execute response generation
-            response_text = task.execute()
-            
             return response_text
             
         except Exception as e:
@@ -178,6 +185,8 @@ class TaskExecutionAgent:
         6. Keep it concise but informative
         7. End with a helpful closing or call-to-action
         
+        {RESPONSE_GUIDELINES}
+        
         Generate the response message now.
         """
     
@@ -223,10 +232,13 @@ class TaskExecutionAgent:
 
 # Singleton instance
 _task_execution_agent = None
+_task_execution_agent_lock = threading.Lock()
 
 def get_task_execution_agent() -> TaskExecutionAgent:
     """Get or create task execution agent singleton"""
     global _task_execution_agent
     if _task_execution_agent is None:
-        _task_execution_agent = TaskExecutionAgent()
+        with _task_execution_agent_lock:
+            if _task_execution_agent is None:
+                _task_execution_agent = TaskExecutionAgent()
     return _task_execution_agent
@@ -1,11 +1,12 @@
 """Channels package initialization"""
-from .base_channel import BaseChannelHandler
+from .base_channel import BaseChannelHandler, StandardizedMessage
 from .email_channel import get_email_handler, EmailChannelHandler
 from .whatsapp_channel import get_whatsapp_handler, WhatsAppChannelHandler
 from .teams_channel import get_teams_handler, TeamsChannelHandler
 
 __all__ = [
     "BaseChannelHandler",
+    "StandardizedMessage",
     "get_email_handler",
     "EmailChannelHandler",
     "get_whatsapp_handler",
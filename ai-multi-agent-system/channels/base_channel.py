@@ -3,12 +3,44 @@ Base Channel Handler
 Abstract base class for all message channel handlers
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from typing import Dict, Any, Iterator, List
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+@dataclass(eq=False)
+class StandardizedMessage(Mapping):
+    """
+    Channel-independent inbound message
+    
+    A slotted object instead of a per-message dict; it also implements the
+    read-only Mapping interface, so code using message['content'] or
+    message.get('channel') works unchanged.
+    """
+    __slots__ = ('message_id', 'channel', 'sender', 'content', 'timestamp', 'metadata')
+    
+    message_id: str
+    channel: str
+    sender: str
+    content: str
+    timestamp: str
+    metadata: Dict[str, Any]
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+    
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+
 class BaseChannelHandler(ABC):
     """Abstract base class for channel handlers"""
     
@@ -17,12 +49,12 @@ class BaseChannelHandler(ABC):
         self.logger = get_logger(f"{__name__}.{channel_name}")
     
     @abstractmethod
-    async def pull_messages(self) -> List[Dict[str, Any]]:
+    async def pull_messages(self) -> List[StandardizedMessage]:
         """
         Pull new messages from the channel
         
         Returns:
-            List of message dictionaries with standardized format:
+            List of StandardizedMessage objects, read like dictionaries:
             {
                 'message_id': str,
                 'channel': str,
@@ -62,7 +94,11 @@ class BaseChannelHandler(ABC):
         """
         pass
     
-    def standardize_message(self, raw_message: Dict[str, Any]) -> Dict[str, Any]:
+    async def close(self):
+        """Release any connections held by the handler"""
+        pass
+    
+    def standardize_message(self, raw_message: Dict[str, Any]) -> StandardizedMessage:
         """
         Convert channel-specific message format to standardized format
         
@@ -70,13 +106,13 @@ class BaseChannelHandler(ABC):
             raw_message: Channel-specific message data
         
         Returns:
-            Standardized message dictionary
+            Standardized message
         """
-        return {
-            'message_id': raw_message.get('id', 'unknown'),
-            'channel': self.channel_name,
-            'sender': raw_message.get('from', 'unknown'),
-            'content': raw_message.get('body', raw_message.get('text', '')),
-            'timestamp': raw_message.get('timestamp', ''),
-            'metadata': raw_message.get('metadata', {})
-        }
+        return StandardizedMessage(
+            message_id=raw_message.get('id', 'unknown'),
+            channel=self.channel_name,
+            sender=raw_message.get('from', 'unknown'),
+            content=raw_message.get('body', raw_message.get('text', '')),
+            timestamp=raw_message.get('timestamp', ''),
+            metadata=raw_message.get('metadata', {})
+        )
@@ -2,15 +2,81 @@
 Email Channel Handler
 Handles email message retrieval and sending via IMAP/SMTP
 """
+import asyncio
 import imaplib
+import re
 import smtplib
+import threading
 import email
+from email import policy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any, List
-from datetime import datetime
-from .base_channel import BaseChannelHandler
+from typing import Dict, Any, List, Optional, Tuple
+from .base_channel import BaseChannelHandler, StandardizedMessage
 from config.settings import settings
+from utils.clock import utcnow_iso
+from utils.dedup import BoundedSet, fast_message_id
+
+UID_PATTERN = re.compile(rb'UID (\d+)')
+
+# A poll cycle usually brings a handful of emails; a small pool covers them
+PARSE_WORKERS = 2
+
+
+def _parse_email_bytes(raw_email: bytes, msg_id: str) -> Tuple[Optional[str], StandardizedMessage]:
+    """
+    Parse a raw RFC822 email; module-level so it can run in a process pool
+    
+    Returns:
+        Tuple of (Message-ID header, standardized message)
+    """
+    email_message = email.message_from_bytes(raw_email, policy=policy.default)
+    header_id = email_message.get('Message-ID')
+    return (str(header_id) if header_id else None), _parse_email_message(email_message, msg_id)
+
+
+def _parse_email_message(email_message, msg_id: str) -> StandardizedMessage:
+    """Parse email message into standardized format"""
+    # Extract sender
+    from_addr = email.utils.parseaddr(email_message.get('From', ''))[1]
+    
+    # Extract subject
+    subject = str(email_message.get('Subject', 'No Subject'))
+    
+    # Extract body: the first text/plain body part; attachments are never decoded
+    body_part = email_message.get_body(preferencelist=('plain',))
+    if body_part is None and not email_message.is_multipart():
+        body_part = email_message
+    
+    body = ""
+    if body_part is not None:
+        payload = body_part.get_payload(decode=True) or b""
+        try:
+            body = payload.decode(body_part.get_content_charset() or 'utf-8')
+        except (LookupError, UnicodeDecodeError):
+            body = payload.decode('utf-8', errors='replace')
+    
+    # Extract timestamp
+    date_str = str(email_message.get('Date', ''))
+    try:
+        timestamp = email.utils.parsedate_to_datetime(date_str).isoformat()
+    except:
+        timestamp = utcnow_iso()
+    
+    return StandardizedMessage(
+        message_id=msg_id,
+        channel='email',
+        sender=from_addr,
+        content=body.strip(),
+        timestamp=timestamp,
+        metadata={
+            'subject': subject,
+            'to': str(email_message.get('To', '')),
+            'cc': str(email_message.get('Cc', '')),
+        }
+    )
 
 
 class EmailChannelHandler(BaseChannelHandler):
@@ -24,62 +90,190 @@ class EmailChannelHandler(BaseChannelHandler):
         self.smtp_port = settings.email.smtp_port
         self.username = settings.email.username
         self.password = settings.email.password
-        self.processed_messages = set()
+        # Processed emails keyed by fast hash of the Message-ID header, and UIDs already fetched
+        self.processed_messages = BoundedSet(settings.app.dedup_max_entries)
+        self._fetched_uids = BoundedSet(settings.app.dedup_max_entries)
+        
+        # UIDs waiting to be flagged \Seen with the next batched STORE; updated from
+        # the IMAP worker thread and from mark_as_read on the event loop
+        self._pending_seen = set()
+        self._pending_seen_lock = threading.Lock()
+        
+        # Long-lived connections, reused across calls and revalidated with NOOP
+        self._imap = None
+        self._smtp = None
+        self._imap_lock = asyncio.Lock()
+        self._smtp_lock = asyncio.Lock()
+        
+        # MIME parsing is CPU-bound; keep it off the event loop
+        self._parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
     
-    async def pull_messages(self) -> List[Dict[str, Any]]:
+    async def pull_messages(self) -> List[StandardizedMessage]:
         """Pull new unread emails from inbox"""
         try:
             self.logger.info("Connecting to email server...")
             
-            # Connect to IMAP server
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.username, self.password)
-            mail.select('inbox')
+            # imaplib is blocking and not thread-safe; run it in a worker thread, one call at a time
+            async with self._imap_lock:
+                fetched = await asyncio.to_thread(self._pull_cycle)
             
-            # Search for unread messages
-            status, message_ids = mail.search(None, 'UNSEEN')
-            
-            if status != 'OK':
-                self.logger.warning("No new messages found")
-                return []
+            # Parse emails in parallel worker processes
+            loop = asyncio.get_running_loop()
+            parsed = await asyncio.gather(*[
+                loop.run_in_executor(self._parse_pool, _parse_email_bytes, raw_email, uid.decode())
+                for uid, raw_email in fetched
+            ], return_exceptions=True)
             
             messages = []
-            message_id_list = message_ids[0].split()
-            
-            for msg_id in message_id_list:
-                if msg_id in self.processed_messages:
+            for (uid, _), result in zip(fetched, parsed):
+                if isinstance(result, BaseException):
+                    self.logger.error("Error parsing email UID {}: {}", uid.decode(), result)
                     continue
                 
-                # Fetch message
-                status, msg_data = mail.fetch(msg_id, '(RFC822)')
-                
-                if status != 'OK':
+                header_id, standardized_message = result
+                # Skip copies of an already processed email (e.g. redelivered under a new UID)
+                dedup_key = fast_message_id(header_id or standardized_message['message_id'])
+                if dedup_key in self.processed_messages:
                     continue
+                self.processed_messages.add(dedup_key)
                 
-                # Parse email
-                raw_email = msg_data[0][1]
-                email_message = email.message_from_bytes(raw_email)
-                
-                # Extract message content
-                standardized_message = self._parse_email_message(email_message, msg_id.decode())
                 messages.append(standardized_message)
-                
-                self.processed_messages.add(msg_id)
             
-            mail.close()
-            mail.logout()
+            # A crashed worker breaks the pool for good; replace it for the next cycle
+            if any(isinstance(result, BrokenProcessPool) for result in parsed):
+                self._parse_pool.shutdown(wait=False)
+                self._parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
             
-            self.logger.info(f"Pulled {len(messages)} new email messages")
+            self.logger.info("Pulled {} new email messages", len(messages))
             return messages
             
         except Exception as e:
-            self.logger.error(f"Error pulling email messages: {str(e)}")
+            self.logger.error("Error pulling email messages: {}", e)
             return []
     
+    def _pull_cycle(self) -> List[Tuple[bytes, bytes]]:
+        """Fetch new emails, then mark them and any deferred mark_as_read ids as seen in one STORE"""
+        fetched = self._fetch_unseen()
+        
+        with self._pending_seen_lock:
+            self._pending_seen.update(uid for uid, _ in fetched)
+        
+        # The fetch already flagged these emails \Seen on the server and recorded their
+        # UIDs, so a failed STORE must not drop them; the UIDs stay pending for next cycle
+        try:
+            self._flush_seen()
+        except (imaplib.IMAP4.error, OSError) as e:
+            self.logger.warning("Error marking emails as read, retrying next cycle: {}", e)
+        
+        return fetched
+    
+    def _fetch_unseen(self) -> List[Tuple[bytes, bytes]]:
+        """
+        Fetch unread, not yet processed emails in a single UID FETCH round trip
+        
+        Returns:
+            List of (uid, raw RFC822 bytes) tuples
+        """
+        mail = self._get_imap()
+        
+        try:
+            # Search for unread messages
+            status, uids = mail.uid('search', None, 'UNSEEN')
+            
+            if status != 'OK':
+                self.logger.warning("No new messages found")
+                return []
+            
+            uid_list = [uid for uid in uids[0].split() if uid not in self._fetched_uids]
+            if not uid_list:
+                return []
+            
+            # Fetch all messages at once
+            status, msg_data = mail.uid('fetch', b','.join(uid_list), '(RFC822)')
+            
+            if status != 'OK':
+                return []
+            
+            # Responses are (b'<seq> (UID <uid> RFC822 {size}', raw) tuples separated by b')'
+            fetched = []
+            for item in msg_data:
+                if not isinstance(item, tuple):
+                    continue
+                match = UID_PATTERN.search(item[0])
+                if match:
+                    fetched.append((match.group(1), item[1]))
+                    self._fetched_uids.add(match.group(1))
+            
+            return fetched
+            
+        except (imaplib.IMAP4.abort, OSError):
+            self._imap = None
+            raise
+    
+    def _get_imap(self) -> imaplib.IMAP4_SSL:
+        """Return the cached IMAP connection, reconnecting if it has dropped"""
+        if self._imap is not None:
+            try:
+                self._imap.noop()
+                return self._imap
+            except (imaplib.IMAP4.error, OSError):
+                self.logger.info("IMAP connection lost, reconnecting...")
+                self._imap = None
+        
+        # Connect to IMAP server
+        mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
+        mail.login(self.username, self.password)
+        mail.select('inbox')
+        
+        self._imap = mail
+        return mail
+    
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return the cached SMTP connection, reconnecting if it has dropped"""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.logger.info("SMTP connection lost, reconnecting...")
+            self._smtp = None
+        
+        # Connect to SMTP server
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        server.login(self.username, self.password)
+        
+        self._smtp = server
+        return server
+    
+    def _send(self, msg: MIMEMultipart):
+        """Send a message over the cached SMTP connection"""
+        try:
+            self._get_smtp().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            self._smtp = None
+            raise
+    
+    def _flush_seen(self):
+        """Flag all pending UIDs as seen with a single UID STORE"""
+        with self._pending_seen_lock:
+            if not self._pending_seen:
+                return
+            uids, self._pending_seen = self._pending_seen, set()
+        
+        try:
+            self._get_imap().uid('store', b','.join(sorted(uids)), '+FLAGS', '\\Seen')
+        except (imaplib.IMAP4.abort, OSError):
+            with self._pending_seen_lock:
+                self._pending_seen |= uids
+            self._imap = None
+            raise
+    
     async def send_message(self, recipient: str, content: str, metadata: Dict[str, Any] = None) -> bool:
         """Send an email message"""
         try:
-            self.logger.info(f"Sending email to {recipient}")
+            self.logger.info("Sending email to {}", recipient)
             
             # Create message
             msg = MIMEMultipart('alternative')
@@ -91,84 +285,50 @@ class EmailChannelHandler(BaseChannelHandler):
             body = MIMEText(content, 'plain')
             msg.attach(body)
             
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.username, self.password)
-            
             # Send email
-            server.send_message(msg)
-            server.quit()
+            async with self._smtp_lock:
+                await asyncio.to_thread(self._send, msg)
             
-            self.logger.info(f"Email sent successfully to {recipient}")
+            self.logger.info("Email sent successfully to {}", recipient)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error sending email: {str(e)}")
+            self.logger.error("Error sending email: {}", e)
             return False
     
     async def mark_as_read(self, message_id: str) -> bool:
-        """Mark email as read"""
-        try:
-            mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            mail.login(self.username, self.password)
-            mail.select('inbox')
-            
-            # Mark as seen
-            mail.store(message_id.encode(), '+FLAGS', '\\Seen')
-            
-            mail.close()
-            mail.logout()
-            
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Error marking email as read: {str(e)}")
-            return False
+        """Mark email as read (deferred to the next pull cycle's batched STORE, or close)"""
+        # Message ids are IMAP UIDs
+        with self._pending_seen_lock:
+            self._pending_seen.add(message_id.encode())
+        return True
     
-    def _parse_email_message(self, email_message, msg_id: str) -> Dict[str, Any]:
-        """Parse email message into standardized format"""
-        # Extract sender
-        from_addr = email.utils.parseaddr(email_message.get('From', ''))[1]
-        
-        # Extract subject
-        subject = email_message.get('Subject', 'No Subject')
-        
-        # Extract body
-        body = ""
-        if email_message.is_multipart():
-            for part in email_message.walk():
-                if part.get_content_type() == "text/plain":
-                    try:
-                        body = part.get_payload(decode=True).decode()
-                    except:
-                        body = str(part.get_payload())
-                    break
-        else:
-            try:
-                body = email_message.get_payload(decode=True).decode()
-            except:
-                body = str(email_message.get_payload())
+    async def close(self):
+        """Log out of the cached IMAP and SMTP connections"""
+        async with self._imap_lock:
+            if self._pending_seen:
+                try:
+                    await asyncio.to_thread(self._flush_seen)
+                except Exception as e:
+                    self.logger.error("Error marking email as read: {}", e)
+            
+            if self._imap is not None:
+                try:
+                    await asyncio.to_thread(self._imap.logout)
+                except Exception as e:
+                    self.logger.warning("Error closing IMAP connection: {}", e)
+                self._imap = None
         
-        # Extract timestamp
-        date_str = email_message.get('Date', '')
-        try:
-            timestamp = email.utils.parsedate_to_datetime(date_str).isoformat()
-        except:
-            timestamp = datetime.utcnow().isoformat()
+        async with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    await asyncio.to_thread(self._smtp.quit)
+                except Exception as e:
+                    self.logger.warning("Error closing SMTP connection: {}", e)
+                self._smtp = None
         
-        return {
-            'message_id': msg_id,
-            'channel': 'email',
-            'sender': from_addr,
-            'content': body.strip(),
-            'timestamp': timestamp,
-            'metadata': {
-                'subject': subject,
-                'to': email_message.get('To', ''),
-                'cc': email_message.get('Cc', ''),
-            }
-        }
+        self._parse_pool.shutdown(wait=False, cancel_futures=True)
+    
 
 
 # Singleton instance
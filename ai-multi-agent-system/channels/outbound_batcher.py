@@ -0,0 +1,123 @@
+"""
+Outbound Batcher
+Coalesces outbound channel sends into batches flushed by a background task
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BATCH_MAX = 50
+FLUSH_INTERVAL = 0.1  # seconds
+
+# Queued by close() so the flusher sends the batch it is holding before it exits
+_STOP = object()
+
+
+class OutboundBatcher:
+    """
+    Queue outbound items and hand them to send_batch in groups
+    
+    A batch is flushed once it holds max_batch items or flush_interval seconds
+    after its first item arrived, whichever comes first. Each submitter gets
+    the send result for its own item.
+    """
+    
+    def __init__(
+        self,
+        send_batch: Callable[[List[Any]], Awaitable[List[bool]]],
+        max_batch: int = BATCH_MAX,
+        flush_interval: float = FLUSH_INTERVAL
+    ):
+        self.send_batch = send_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def submit(self, item: Any) -> bool:
+        """
+        Queue an item and wait until its batch has been sent
+        
+        Args:
+            item: Channel-specific outbound item
+        
+        Returns:
+            True if the item was sent successfully, False otherwise
+        """
+        # Started lazily so handlers can be constructed outside the event loop; the
+        # loop is looked up once here rather than for every submitted item
+        if self._flusher is None or self._flusher.done():
+            self._loop = asyncio.get_running_loop()
+            self._queue = self._queue or asyncio.Queue()
+            self._flusher = self._loop.create_task(self._run())
+        
+        future = self._loop.create_future()
+        await self._queue.put((item, future))
+        return await future
+    
+    async def close(self):
+        """Send anything still queued and stop the flusher"""
+        if self._flusher is None:
+            return
+        
+        self._queue.put_nowait(_STOP)
+        try:
+            await self._flusher
+        except Exception as e:
+            logger.error("Outbound flusher failed: {}", e)
+        self._flusher = None
+        
+        # Normally empty; covers a flusher that had already died
+        batch = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not _STOP:
+                batch.append(entry)
+        if batch:
+            await self._send(batch)
+    
+    async def _run(self):
+        """Collect queued items into batches and send them"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                return
+            
+            batch = [entry]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            await self._send(batch)
+            if stopping:
+                return
+    
+    async def _send(self, batch: List[Any]):
+        """Send one batch and resolve its submitters' futures"""
+        items = [item for item, _ in batch]
+        try:
+            results = await self.send_batch(items)
+        except Exception as e:
+            logger.error("Error sending outbound batch of {}: {}", len(items), e)
+            results = [False] * len(items)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(bool(result))
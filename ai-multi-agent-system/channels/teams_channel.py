@@ -2,12 +2,60 @@
 Teams Channel Handler
 Handles Microsoft Teams message retrieval and sending
 """
+import copy
 import httpx
-import pymsteams
-from typing import Dict, Any, List
-from datetime import datetime
-from .base_channel import BaseChannelHandler
+import orjson
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .base_channel import BaseChannelHandler, StandardizedMessage
+from .outbound_batcher import OutboundBatcher
 from config.settings import settings
+from utils.clock import utcnow_iso
+from utils.dedup import create_dedup_filter, fast_message_id
+
+
+MESSAGE_CARD_CONTEXT = "https://schema.org/extensions"
+
+# Card colors by message type, most severe first
+_COLOR_BY_TYPE = {
+    "error": "FF0000",    # Red
+    "warning": "FFA500",  # Orange
+    "success": "00FF00"   # Green
+}
+_DEFAULT_COLOR = "0078D4"  # Blue (default Teams color)
+
+# Limits Teams accepts for an invoke response's cacheInfo.cacheDuration, in seconds
+CACHE_DURATION_MIN = 60
+CACHE_DURATION_MAX = 2592000  # 30 days
+
+# Adaptive Card scaffold, deep-copied per card; the two TextBlocks hold title and message
+_ADAPTIVE_CARD_SKELETON = {
+    "type": "message",
+    "attachments": [
+        {
+            "contentType": "application/vnd.microsoft.card.adaptive",
+            "content": {
+                "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+                "type": "AdaptiveCard",
+                "version": "1.4",
+                "body": [
+                    {
+                        "type": "TextBlock",
+                        "text": "",
+                        "weight": "bolder",
+                        "size": "large",
+                        "wrap": True
+                    },
+                    {
+                        "type": "TextBlock",
+                        "text": "",
+                        "wrap": True,
+                        "spacing": "medium"
+                    }
+                ]
+            }
+        }
+    ]
+}
 
 
 class TeamsChannelHandler(BaseChannelHandler):
@@ -19,9 +67,11 @@ class TeamsChannelHandler(BaseChannelHandler):
         self.bot_id = settings.teams.bot_id
         self.bot_password = settings.teams.bot_password
         self.app_id = settings.teams.app_id
-        self.processed_messages = set()
+        self.processed_messages = create_dedup_filter(settings.app.dedup_strategy, settings.app.dedup_max_entries)
+        self._client = httpx.AsyncClient(timeout=30.0, headers={"Content-Type": "application/json"})
+        self._outbound = OutboundBatcher(self._send_batch)
     
-    async def pull_messages(self) -> List[Dict[str, Any]]:
+    async def pull_messages(self) -> List[StandardizedMessage]:
         """
         Pull new Teams messages
         Note: Teams typically uses Bot Framework for message handling
@@ -38,70 +88,100 @@ class TeamsChannelHandler(BaseChannelHandler):
             return []
             
         except Exception as e:
-            self.logger.error(f"Error pulling Teams messages: {str(e)}")
+            self.logger.error("Error pulling Teams messages: {}", e)
             return []
     
     async def send_message(self, recipient: str, content: str, metadata: Dict[str, Any] = None) -> bool:
-        """Send a message to Teams channel via webhook"""
+        """Send a message to Teams channel via webhook (queued and sent together with other pending messages)"""
+        return await self._outbound.submit((recipient, content, metadata))
+    
+    async def _send_batch(self, items: List[Tuple[str, str, Dict[str, Any]]]) -> List[bool]:
+        """Send queued messages to the channel webhook as a single card"""
+        if len(items) == 1:
+            card = self._build_card(*items[0])
+        else:
+            card = self._build_combined_card(items)
+        
+        sent = await self._post_card(card, f"{len(items)} Teams message(s)")
+        return [sent] * len(items)
+    
+    async def _post_card(self, payload: Dict[str, Any], description: str) -> bool:
+        """Post a card payload to the channel webhook"""
         try:
-            self.logger.info(f"Sending Teams message to {recipient}")
-            
-            # Create Teams message card
-            teams_message = pymsteams.connectorcard(self.webhook_url)
+            self.logger.info("Sending {}", description)
             
-            # Set message title and text
-            if metadata and metadata.get('title'):
-                teams_message.title(metadata['title'])
+            response = await self._client.post(self.webhook_url, content=orjson.dumps(payload))
+            response.raise_for_status()
             
-            teams_message.text(content)
-            
-            # Add color based on message type
-            if metadata:
-                if metadata.get('type') == 'error':
-                    teams_message.color('FF0000')  # Red
-                elif metadata.get('type') == 'success':
-                    teams_message.color('00FF00')  # Green
-                elif metadata.get('type') == 'warning':
-                    teams_message.color('FFA500')  # Orange
-                else:
-                    teams_message.color('0078D4')  # Blue (default Teams color)
-            
-            # Add sections if provided
-            if metadata and metadata.get('sections'):
-                for section_data in metadata['sections']:
-                    section = pymsteams.cardsection()
-                    section.title(section_data.get('title', ''))
-                    section.text(section_data.get('text', ''))
-                    teams_message.addSection(section)
-            
-            # Send message
-            teams_message.send()
-            
-            self.logger.info(f"Teams message sent successfully")
+            self.logger.info("{} sent successfully", description)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error sending Teams message: {str(e)}")
+            self.logger.error("Error sending {}: {}", description, e)
             return False
     
+    def _build_combined_card(self, items: List[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Build one card with a section per queued message"""
+        # Use the most severe message type for the card color
+        types = {(metadata or {}).get('type') for _, _, metadata in items}
+        severity = next((t for t in _COLOR_BY_TYPE if t in types), None)
+        
+        card = {
+            "@type": "MessageCard",
+            "@context": MESSAGE_CARD_CONTEXT,
+            "text": f"{len(items)} messages",
+            "themeColor": _COLOR_BY_TYPE.get(severity, _DEFAULT_COLOR),
+            "sections": []
+        }
+        
+        for recipient, content, metadata in items:
+            metadata = metadata or {}
+            sections = [{'title': metadata.get('title', recipient), 'text': content}, *metadata.get('sections', [])]
+            for section_data in sections:
+                card["sections"].append({
+                    "title": section_data.get('title', ''),
+                    "text": section_data.get('text', '')
+                })
+        
+        return card
+    
+    def _build_card(self, recipient: str, content: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Build the card payload for a single message"""
+        # Create Teams message card
+        card = {
+            "@type": "MessageCard",
+            "@context": MESSAGE_CARD_CONTEXT,
+            "text": content,
+            # Add color based on message type
+            "themeColor": _COLOR_BY_TYPE.get(metadata.get('type'), _DEFAULT_COLOR) if metadata else _DEFAULT_COLOR
+        }
+        
+        # Set message title
+        if metadata and metadata.get('title'):
+            card["title"] = metadata['title']
+        
+        # Add sections if provided
+        if metadata and metadata.get('sections'):
+            card["sections"] = [
+                {"title": section_data.get('title', ''), "text": section_data.get('text', '')}
+                for section_data in metadata['sections']
+            ]
+        
+        return card
+    
     async def send_adaptive_card(self, recipient: str, card_data: Dict[str, Any]) -> bool:
         """Send an Adaptive Card to Teams"""
         try:
-            self.logger.info(f"Sending Teams Adaptive Card to {recipient}")
-            
-            teams_message = pymsteams.connectorcard(self.webhook_url)
+            self.logger.info("Sending Teams Adaptive Card to {}", recipient)
             
-            # Set payload for Adaptive Card
-            teams_message.payload = card_data
-            
-            # Send card
-            teams_message.send()
+            response = await self._client.post(self.webhook_url, content=orjson.dumps(card_data))
+            response.raise_for_status()
             
             self.logger.info("Teams Adaptive Card sent successfully")
             return True
             
         except Exception as e:
-            self.logger.error(f"Error sending Teams Adaptive Card: {str(e)}")
+            self.logger.error("Error sending Teams Adaptive Card: {}", e)
             return False
     
     async def mark_as_read(self, message_id: str) -> bool:
@@ -109,15 +189,20 @@ class TeamsChannelHandler(BaseChannelHandler):
         try:
             # Teams Bot Framework handles read receipts differently
             # This would require Bot Framework SDK integration
-            self.logger.info(f"Marking Teams message {message_id} as read")
+            self.logger.info("Marking Teams message {} as read", message_id)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error marking Teams message as read: {str(e)}")
+            self.logger.error("Error marking Teams message as read: {}", e)
             return False
     
-    def _parse_teams_message(self, activity: Dict[str, Any]) -> Dict[str, Any]:
-        """Parse Teams Bot Framework activity into standardized format"""
+    async def close(self):
+        """Flush queued messages and close the HTTP client"""
+        await self._outbound.close()
+        await self._client.aclose()
+    
+    def _parse_teams_message(self, activity: Dict[str, Any], id_hash: Optional[int] = None) -> StandardizedMessage:
+        """Parse Teams Bot Framework activity into standardized format (id_hash: its fast_message_id, if already computed)"""
         # Extract message content
         content = activity.get('text', '')
         
@@ -126,48 +211,56 @@ class TeamsChannelHandler(BaseChannelHandler):
         sender = sender_info.get('name', sender_info.get('id', 'unknown'))
         
         # Extract timestamp
-        timestamp = activity.get('timestamp', datetime.utcnow().isoformat())
+        timestamp = activity.get('timestamp') or utcnow_iso()
         
         # Extract conversation info
         conversation = activity.get('conversation', {})
         
-        return {
-            'message_id': activity.get('id', 'unknown'),
-            'channel': 'teams',
-            'sender': sender,
-            'content': content,
-            'timestamp': timestamp,
-            'metadata': {
+        return StandardizedMessage(
+            message_id=activity.get('id', 'unknown'),
+            channel='teams',
+            sender=sender,
+            content=content,
+            timestamp=timestamp,
+            metadata={
                 'conversation_id': conversation.get('id', ''),
                 'channel_id': activity.get('channelId', ''),
                 'service_url': activity.get('serviceUrl', ''),
                 'recipient': activity.get('recipient', {}).get('name', ''),
-                'activity_type': activity.get('type', 'message')
+                'activity_type': activity.get('type', 'message'),
+                'id_hash64': fast_message_id(activity.get('id', 'unknown')) if id_hash is None else id_hash
             }
-        }
+        )
     
-    async def handle_webhook(self, activity: Dict[str, Any]) -> Dict[str, Any]:
+    async def handle_webhook(self, activity: Union[bytes, str, Dict[str, Any]]) -> Optional[StandardizedMessage]:
         """
         Handle incoming Teams Bot Framework activity
         
         Args:
-            activity: Bot Framework activity object
+            activity: Bot Framework activity object, parsed or as the raw request body
         
         Returns:
             Standardized message
         """
         try:
+            if isinstance(activity, (bytes, str)):
+                activity = orjson.loads(activity)
+            
             message_id = activity.get('id')
+            if not message_id:
+                return None
             
-            if message_id and message_id not in self.processed_messages:
-                standardized_message = self._parse_teams_message(activity)
-                self.processed_messages.add(message_id)
-                return standardized_message
+            id_hash = fast_message_id(message_id)
+            if id_hash in self.processed_messages:
+                return None
             
-            return None
+            # Recorded only once parsed, so a failed activity is handled again on redelivery
+            message = self._parse_teams_message(activity, id_hash)
+            self.processed_messages.check_and_add(id_hash)
+            return message
             
         except Exception as e:
-            self.logger.error(f"Error handling Teams webhook: {str(e)}")
+            self.logger.error("Error handling Teams webhook: {}", e)
             return None
     
     async def send_typing_indicator(self, conversation_id: str) -> bool:
@@ -175,11 +268,11 @@ class TeamsChannelHandler(BaseChannelHandler):
         try:
             # This would require Bot Framework SDK
             # Placeholder implementation
-            self.logger.info(f"Sending typing indicator to conversation {conversation_id}")
+            self.logger.info("Sending typing indicator to conversation {}", conversation_id)
             return True
             
         except Exception as e:
-            self.logger.error(f"Error sending typing indicator: {str(e)}")
+            self.logger.error("Error sending typing indicator: {}", e)
             return False
     
     def create_adaptive_card_response(
@@ -187,7 +280,8 @@ class TeamsChannelHandler(BaseChannelHandler):
         title: str, 
         message: str, 
         facts: List[Dict[str, str]] = None,
-        actions: List[Dict[str, Any]] = None
+        actions: List[Dict[str, Any]] = None,
+        cache_seconds: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Create an Adaptive Card payload for rich Teams messages
@@ -197,38 +291,16 @@ class TeamsChannelHandler(BaseChannelHandler):
             message: Main message text
             facts: List of fact dictionaries with 'name' and 'value' keys
             actions: List of action button definitions
+            cache_seconds: Let the Teams client cache the response for this long instead of
+                invoking the bot again (only for idempotent results, e.g. policy lookups)
         
         Returns:
             Adaptive Card JSON payload
         """
-        card = {
-            "type": "message",
-            "attachments": [
-                {
-                    "contentType": "application/vnd.microsoft.card.adaptive",
-                    "content": {
-                        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
-                        "type": "AdaptiveCard",
-                        "version": "1.4",
-                        "body": [
-                            {
-                                "type": "TextBlock",
-                                "text": title,
-                                "weight": "bolder",
-                                "size": "large",
-                                "wrap": True
-                            },
-                            {
-                                "type": "TextBlock",
-                                "text": message,
-                                "wrap": True,
-                                "spacing": "medium"
-                            }
-                        ]
-                    }
-                }
-            ]
-        }
+        card = copy.deepcopy(_ADAPTIVE_CARD_SKELETON)
+        content = card["attachments"][0]["content"]
+        content["body"][0]["text"] = title
+        content["body"][1]["text"] = message
         
         # Add facts if provided
         if facts:
@@ -236,11 +308,18 @@ class TeamsChannelHandler(BaseChannelHandler):
                 "type": "FactSet",
                 "facts": [{"title": f['name'], "value": f['value']} for f in facts]
             }
-            card["attachments"][0]["content"]["body"].append(fact_set)
+            content["body"].append(fact_set)
         
         # Add actions if provided
         if actions:
-            card["attachments"][0]["content"]["actions"] = actions
+            content["actions"] = actions
+        
+        # Let Teams serve repeat invokes from its cache
+        if cache_seconds is not None:
+            card["cacheInfo"] = {
+                "cacheType": "cache",
+                "cacheDuration": min(max(cache_seconds, CACHE_DURATION_MIN), CACHE_DURATION_MAX)
+            }
         
         return card
 
@@ -2,11 +2,31 @@
 WhatsApp Channel Handler
 Handles WhatsApp message retrieval and sending via WhatsApp Business API
 """
+import asyncio
 import httpx
-from typing import Dict, Any, List
-from datetime import datetime
-from .base_channel import BaseChannelHandler
+import orjson
+from typing import Dict, Any, List, Optional, Set, Tuple, Union
+from .base_channel import BaseChannelHandler, StandardizedMessage
+from .outbound_batcher import OutboundBatcher
 from config.settings import settings
+from utils.clock import iso_from_unix, utcnow_iso
+from utils.dedup import create_dedup_filter, fast_message_id
+
+
+# Read receipts allowed in flight before mark_as_read waits for one to finish
+MAX_PENDING_RECEIPTS = 100
+
+# Webhook batches at least this large are parsed in a worker thread
+WEBHOOK_OFFLOAD_THRESHOLD = 100
+
+# Content extractors by WhatsApp message type; unknown types have no text content
+_TYPE_EXTRACTORS = {
+    'text': lambda m: m.get('text', {}).get('body', ''),
+    'image': lambda m: f"[Image] {m.get('image', {}).get('caption', '')}",
+    'document': lambda m: f"[Document] {m.get('document', {}).get('filename', '')}",
+    'audio': lambda m: "[Audio Message]",
+    'video': lambda m: f"[Video] {m.get('video', {}).get('caption', '')}",
+}
 
 
 class WhatsAppChannelHandler(BaseChannelHandler):
@@ -18,13 +38,25 @@ class WhatsAppChannelHandler(BaseChannelHandler):
         self.access_token = settings.whatsapp.access_token
         self.phone_number_id = settings.whatsapp.phone_number_id
         self.business_account_id = settings.whatsapp.business_account_id
-        self.processed_messages = set()
+        self.processed_messages = create_dedup_filter(settings.app.dedup_strategy, settings.app.dedup_max_entries)
+        self.messages_url = f"{self.api_url}/{self.phone_number_id}/messages"
         self.headers = {
             'Authorization': f'Bearer {self.access_token}',
             'Content-Type': 'application/json'
         }
+        
+        # One pooled HTTP/2 client for all Graph API calls; headers are bound once here
+        self._client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            headers=self.headers,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+        )
+        self._outbound = OutboundBatcher(self._send_batch)
+        # Read receipts posted in the background (kept referenced until done)
+        self._pending_receipts: Set[asyncio.Task] = set()
     
-    async def pull_messages(self) -> List[Dict[str, Any]]:
+    async def pull_messages(self) -> List[StandardizedMessage]:
         """Pull new WhatsApp messages"""
         try:
             self.logger.info("Fetching WhatsApp messages...")
@@ -33,167 +65,190 @@ class WhatsAppChannelHandler(BaseChannelHandler):
             # This method would typically be called by a webhook handler
             # For polling, we'd use the Messages API endpoint
             
-            async with httpx.AsyncClient() as client:
-                url = f"{self.api_url}/{self.phone_number_id}/messages"
-                
-                response = await client.get(
-                    url,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                
-                if response.status_code != 200:
-                    self.logger.error(f"WhatsApp API error: {response.status_code}")
-                    return []
-                
-                data = response.json()
-                messages = []
-                
-                # Parse messages
-                for msg_data in data.get('messages', []):
-                    msg_id = msg_data.get('id')
-                    
-                    if msg_id in self.processed_messages:
-                        continue
-                    
-                    standardized_message = self._parse_whatsapp_message(msg_data)
-                    messages.append(standardized_message)
-                    
-                    self.processed_messages.add(msg_id)
-                
-                self.logger.info(f"Pulled {len(messages)} new WhatsApp messages")
-                return messages
-                
+            response = await self._client.get(self.messages_url)
+            
+            if response.status_code != 200:
+                self.logger.error("WhatsApp API error: {}", response.status_code)
+                return []
+            
+            data = orjson.loads(response.content)
+            
+            # Parse messages
+            kept = self._select_new([(fast_message_id(msg_data.get('id')), msg_data) for msg_data in data.get('messages', [])])
+            messages = self._parse_whatsapp_messages(kept)
+            self._mark_processed(messages)
+            
+            self.logger.info("Pulled {} new WhatsApp messages", len(messages))
+            return messages
+            
         except Exception as e:
-            self.logger.error(f"Error pulling WhatsApp messages: {str(e)}")
+            self.logger.error("Error pulling WhatsApp messages: {}", e)
             return []
     
     async def send_message(self, recipient: str, content: str, metadata: Dict[str, Any] = None) -> bool:
-        """Send a WhatsApp message"""
+        """Send a WhatsApp message (queued and sent together with other pending messages)"""
+        return await self._outbound.submit((recipient, content))
+    
+    async def _send_batch(self, items: List[Tuple[str, str]]) -> List[bool]:
+        """Send queued messages; the Cloud API has no batch endpoint, so requests are pipelined"""
+        return await asyncio.gather(*(self._post_message(recipient, content) for recipient, content in items))
+    
+    async def _post_message(self, recipient: str, content: str) -> bool:
+        """Post one text message to the WhatsApp Cloud API"""
         try:
-            self.logger.info(f"Sending WhatsApp message to {recipient}")
+            self.logger.info("Sending WhatsApp message to {}", recipient)
             
-            async with httpx.AsyncClient() as client:
-                url = f"{self.api_url}/{self.phone_number_id}/messages"
-                
-                payload = {
-                    "messaging_product": "whatsapp",
-                    "recipient_type": "individual",
-                    "to": recipient,
-                    "type": "text",
-                    "text": {
-                        "preview_url": False,
-                        "body": content
-                    }
+            payload = {
+                "messaging_product": "whatsapp",
+                "recipient_type": "individual",
+                "to": recipient,
+                "type": "text",
+                "text": {
+                    "preview_url": False,
+                    "body": content
                 }
+            }
+            
+            response = await self._client.post(self.messages_url, content=orjson.dumps(payload))
+            
+            if response.status_code == 200:
+                self.logger.info("WhatsApp message sent successfully to {}", recipient)
+                return True
+            else:
+                self.logger.error("WhatsApp send failed: {} - {}", response.status_code, response.content[:512])
+                return False
                 
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    self.logger.info(f"WhatsApp message sent successfully to {recipient}")
-                    return True
-                else:
-                    self.logger.error(f"WhatsApp send failed: {response.status_code} - {response.text}")
-                    return False
-                    
         except Exception as e:
-            self.logger.error(f"Error sending WhatsApp message: {str(e)}")
+            self.logger.error("Error sending WhatsApp message: {}", e)
             return False
     
     async def mark_as_read(self, message_id: str) -> bool:
-        """Mark WhatsApp message as read"""
+        """Mark WhatsApp message as read (posted in the background; failures are logged)"""
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{self.api_url}/{self.phone_number_id}/messages"
-                
-                payload = {
-                    "messaging_product": "whatsapp",
-                    "status": "read",
-                    "message_id": message_id
-                }
-                
-                response = await client.post(
-                    url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=30.0
-                )
-                
-                return response.status_code == 200
-                
+            payload = {
+                "messaging_product": "whatsapp",
+                "status": "read",
+                "message_id": message_id
+            }
+            
+            # Apply backpressure instead of letting receipts pile up without bound
+            if len(self._pending_receipts) >= MAX_PENDING_RECEIPTS:
+                await asyncio.wait(self._pending_receipts, return_when=asyncio.FIRST_COMPLETED)
+            
+            task = asyncio.create_task(self._client.post(self.messages_url, content=orjson.dumps(payload)))
+            self._pending_receipts.add(task)
+            task.add_done_callback(self._pending_receipts.discard)
+            task.add_done_callback(lambda t: self._log_receipt_result(t, message_id))
+            
+            return True
+            
         except Exception as e:
-            self.logger.error(f"Error marking WhatsApp message as read: {str(e)}")
+            self.logger.error("Error marking WhatsApp message as read: {}", e)
             return False
     
-    def _parse_whatsapp_message(self, msg_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Parse WhatsApp message into standardized format"""
+    def _log_receipt_result(self, task: asyncio.Task, message_id: str):
+        """Log a failed background read receipt"""
+        if task.cancelled():
+            return
+        
+        if task.exception() is not None:
+            self.logger.error("Error marking WhatsApp message {} as read: {}", message_id, task.exception())
+        elif task.result().status_code != 200:
+            self.logger.error("WhatsApp read receipt for {} failed: {}", message_id, task.result().status_code)
+    
+    async def close(self):
+        """Flush queued messages, wait for read receipts and close the pooled HTTP client"""
+        await self._outbound.close()
+        if self._pending_receipts:
+            await asyncio.wait(self._pending_receipts)
+        await self._client.aclose()
+    
+    def _parse_whatsapp_message(self, msg_data: Dict[str, Any], id_hash: Optional[int] = None) -> StandardizedMessage:
+        """Parse WhatsApp message into standardized format (id_hash: its fast_message_id, if already computed)"""
         # Extract message content based on type
-        content = ""
         msg_type = msg_data.get('type', 'text')
-        
-        if msg_type == 'text':
-            content = msg_data.get('text', {}).get('body', '')
-        elif msg_type == 'image':
-            content = f"[Image] {msg_data.get('image', {}).get('caption', '')}"
-        elif msg_type == 'document':
-            content = f"[Document] {msg_data.get('document', {}).get('filename', '')}"
-        elif msg_type == 'audio':
-            content = "[Audio Message]"
-        elif msg_type == 'video':
-            content = f"[Video] {msg_data.get('video', {}).get('caption', '')}"
+        extract = _TYPE_EXTRACTORS.get(msg_type)
+        content = extract(msg_data) if extract else ""
         
         # Extract timestamp
-        timestamp_unix = msg_data.get('timestamp', 0)
-        try:
-            timestamp = datetime.fromtimestamp(int(timestamp_unix)).isoformat()
-        except:
-            timestamp = datetime.utcnow().isoformat()
+        timestamp = iso_from_unix(msg_data.get('timestamp')) or utcnow_iso()
         
-        return {
-            'message_id': msg_data.get('id', 'unknown'),
-            'channel': 'whatsapp',
-            'sender': msg_data.get('from', 'unknown'),
-            'content': content,
-            'timestamp': timestamp,
-            'metadata': {
+        return StandardizedMessage(
+            message_id=msg_data.get('id', 'unknown'),
+            channel='whatsapp',
+            sender=msg_data.get('from', 'unknown'),
+            content=content,
+            timestamp=timestamp,
+            metadata={
                 'type': msg_type,
                 'name': msg_data.get('profile', {}).get('name', ''),
-                'context': msg_data.get('context', {})
+                'context': msg_data.get('context', {}),
+                'id_hash64': fast_message_id(msg_data.get('id')) if id_hash is None else id_hash
             }
-        }
+        )
+    
+    def _parse_whatsapp_messages(self, hashed_messages: List[Tuple[int, Dict[str, Any]]]) -> List[StandardizedMessage]:
+        """Parse (id hash, message) pairs into standardized messages, skipping any that fail to parse"""
+        parsed = []
+        for id_hash, message in hashed_messages:
+            try:
+                parsed.append(self._parse_whatsapp_message(message, id_hash))
+            except Exception as e:
+                self.logger.error("Error parsing WhatsApp message {}: {}", message.get('id'), e)
+        return parsed
     
-    async def handle_webhook(self, webhook_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _select_new(self, hashed_messages: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Drop (id hash, message) pairs already processed or repeated within the batch"""
+        seen_in_batch = set()
+        kept = []
+        for id_hash, message in hashed_messages:
+            if id_hash in seen_in_batch or id_hash in self.processed_messages:
+                continue
+            seen_in_batch.add(id_hash)
+            kept.append((id_hash, message))
+        return kept
+    
+    def _mark_processed(self, messages: List[StandardizedMessage]):
+        """Record parsed messages in the dedup filter, so failed ones are retried on redelivery"""
+        for message in messages:
+            self.processed_messages.check_and_add(message.metadata['id_hash64'])
+    
+    async def handle_webhook(self, webhook_data: Union[bytes, str, Dict[str, Any]]) -> List[StandardizedMessage]:
         """
         Handle incoming WhatsApp webhook data
         
         Args:
-            webhook_data: Webhook payload from WhatsApp
+            webhook_data: Webhook payload from WhatsApp, parsed or as the raw request body
         
         Returns:
             List of standardized messages
         """
         try:
-            messages = []
-            
-            for entry in webhook_data.get('entry', []):
-                for change in entry.get('changes', []):
-                    value = change.get('value', {})
-                    
-                    for message in value.get('messages', []):
-                        if message.get('id') not in self.processed_messages:
-                            standardized_message = self._parse_whatsapp_message(message)
-                            messages.append(standardized_message)
-                            self.processed_messages.add(message.get('id'))
+            if isinstance(webhook_data, (bytes, str)):
+                webhook_data = orjson.loads(webhook_data)
+            
+            # Flatten entry -> changes -> value.messages
+            candidates = [
+                message
+                for entry in webhook_data.get('entry', ())
+                for change in entry.get('changes', ())
+                for message in change.get('value', {}).get('messages', ())
+            ]
+            
+            # Hash each id once, for the dedup pass and the parsed message's metadata
+            kept = self._select_new([(fast_message_id(message.get('id')), message) for message in candidates])
+            
+            # Dedup stays on the event loop (the filter isn't thread-safe); only parsing moves off it
+            if len(kept) >= WEBHOOK_OFFLOAD_THRESHOLD:
+                messages = await asyncio.to_thread(self._parse_whatsapp_messages, kept)
+            else:
+                messages = self._parse_whatsapp_messages(kept)
             
+            self._mark_processed(messages)
             return messages
             
         except Exception as e:
-            self.logger.error(f"Error handling WhatsApp webhook: {str(e)}")
+            self.logger.error("Error handling WhatsApp webhook: {}", e)
             return []
 
 
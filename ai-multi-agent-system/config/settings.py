@@ -13,8 +13,14 @@ class AzureOpenAISettings(BaseSettings):
     api_key: str = Field(..., env="AZURE_OPENAI_API_KEY")
     endpoint: str = Field(..., env="AZURE_OPENAI_ENDPOINT")
     deployment_name: str = Field(..., env="AZURE_OPENAI_DEPLOYMENT_NAME")
-    api_version: str = Field(default="2024-02-15-preview", env="AZURE_OPENAI_API_VERSION")
+    api_version: str = Field(default="2024-10-21", env="AZURE_OPENAI_API_VERSION")
     model: str = Field(default="gpt-4", env="AZURE_OPENAI_MODEL")
+    batch_deployment_name: Optional[str] = Field(None, env="AZURE_OPENAI_BATCH_DEPLOYMENT_NAME")
+    batch_poll_interval: int = Field(default=60, env="AZURE_OPENAI_BATCH_POLL_INTERVAL")
+    batch_max_wait: int = Field(default=86400, env="AZURE_OPENAI_BATCH_MAX_WAIT")
+    embedding_deployment_name: Optional[str] = Field(None, env="AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+    rpm: int = Field(default=300, env="AZURE_OPENAI_RPM")
+    max_concurrency: int = Field(default=20, env="AZURE_OPENAI_MAX_CONCURRENCY")
 
     class Config:
         env_file = ".env"
@@ -26,6 +32,8 @@ class IDITAPISettings(BaseSettings):
     base_url: str = Field(..., env="IDIT_API_BASE_URL")
     api_key: str = Field(..., env="IDIT_API_KEY")
     timeout: int = Field(default=30, env="IDIT_API_TIMEOUT")
+    circuit_failure_threshold: int = Field(default=5, env="IDIT_API_CIRCUIT_FAILURE_THRESHOLD")
+    circuit_cooldown: int = Field(default=30, env="IDIT_API_CIRCUIT_COOLDOWN")
 
     class Config:
         env_file = ".env"
@@ -74,9 +82,19 @@ class AppSettings(BaseSettings):
     """Application Configuration"""
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
     message_poll_interval: int = Field(default=60, env="MESSAGE_POLL_INTERVAL")
+    poll_coalesce_window: float = Field(default=0, env="POLL_COALESCE_WINDOW")
     max_concurrent_tasks: int = Field(default=5, env="MAX_CONCURRENT_TASKS")
+    message_timeout: int = Field(default=300, env="MESSAGE_TIMEOUT")
+    fuse_classification_and_task: bool = Field(default=False, env="FUSE_CLASSIFICATION_AND_TASK")
     enable_retry: bool = Field(default=True, env="ENABLE_RETRY")
     max_retries: int = Field(default=3, env="MAX_RETRIES")
+    semantic_cache_threshold: float = Field(default=0.92, env="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_size: int = Field(default=10000, env="SEMANTIC_CACHE_SIZE")
+    prompt_cache_size: int = Field(default=10000, env="PROMPT_CACHE_SIZE")
+    prompt_cache_ttl: int = Field(default=3600, env="PROMPT_CACHE_TTL")
+    dedup_max_entries: int = Field(default=50000, env="DEDUP_MAX_ENTRIES")
+    dedup_strategy: str = Field(default="bloom", env="DEDUP_STRATEGY")
+    prompt_content_max_chars: int = Field(default=1000, env="PROMPT_CONTENT_MAX_CHARS")
     database_url: Optional[str] = Field(None, env="DATABASE_URL")
     redis_host: Optional[str] = Field(None, env="REDIS_HOST")
     redis_port: Optional[int] = Field(None, env="REDIS_PORT")
@@ -42,7 +42,7 @@ async def example_2_classify_only():
         'metadata': {}
     }
     
-    classification = classifier.classify_message(message)
+    classification = await classifier.aclassify_message(message)
     print(f"Classification: {classification}")
 
 
@@ -79,10 +79,12 @@ async def example_3_process_batch():
         }
     ]
     
-    results = await orchestrator.process_messages(messages)
-    print(f"Processed {len(results)} messages")
-    for result in results:
+    # Results are printed as each message finishes, not after the whole batch
+    processed = 0
+    async for result in orchestrator.stream_messages(messages):
+        processed += 1
         print(f"  - {result['message_id']}: {result['status']}")
+    print(f"Processed {processed} messages")
 
 
 async def example_4_send_response():
@@ -112,9 +114,13 @@ async def example_5_pull_messages():
     messages = await message_service.pull_all_messages()
     print(f"Pulled {len(messages)} messages from all channels")
     
-    # Pull from specific channel
-    email_messages = await message_service.pull_from_channel('email')
-    print(f"Pulled {len(email_messages)} messages from email")
+    # Pull from specific channels concurrently
+    channels = ['email', 'whatsapp', 'teams']
+    channel_messages = await asyncio.gather(
+        *(message_service.pull_from_channel(channel) for channel in channels)
+    )
+    for channel, messages in zip(channels, channel_messages):
+        print(f"Pulled {len(messages)} messages from {channel}")
 
 
 async def run_all_examples():
@@ -4,13 +4,21 @@ AI Multi-Agent Orchestration System
 """
 import asyncio
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    # libuv-based event loop; optional and unavailable on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Add project root to Python path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from orchestrator import get_orchestrator
+from agents import get_classification_agent, get_task_creation_agent, get_task_execution_agent
 from utils.logger import get_logger
 from config.settings import settings
 from dotenv import load_dotenv
@@ -21,17 +29,35 @@ load_dotenv()
 logger = get_logger(__name__)
 
 
+def warm_up_agents():
+    """Construct the LLM agent singletons concurrently so the first message doesn't pay for it"""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(get_classification_agent),
+            executor.submit(get_task_creation_agent),
+            executor.submit(get_task_execution_agent)
+        ]
+        for future in futures:
+            future.result()
+
+
 async def main():
     """Main application entry point"""
     logger.info("=" * 60)
     logger.info("AI Multi-Agent Orchestration System")
     logger.info("=" * 60)
-    logger.info(f"Log Level: {settings.app.log_level}")
-    logger.info(f"Poll Interval: {settings.app.message_poll_interval}s")
-    logger.info(f"Max Concurrent Tasks: {settings.app.max_concurrent_tasks}")
+    logger.info("Log Level: {}", settings.app.log_level)
+    logger.info("Poll Interval: {}s", settings.app.message_poll_interval)
+    logger.info("Max Concurrent Tasks: {}", settings.app.max_concurrent_tasks)
     logger.info("=" * 60)
     
+    orchestrator = None
+    
     try:
+        # Initialize agents before the orchestrator picks them up
+        logger.info("Initializing agents...")
+        await asyncio.to_thread(warm_up_agents)
+        
         # Get orchestrator instance
         orchestrator = get_orchestrator()
         
@@ -42,20 +68,25 @@ async def main():
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt")
     except Exception as e:
-        logger.error(f"Application error: {str(e)}")
+        logger.error("Application error: {}", e)
         raise
     finally:
+        if orchestrator:
+            await orchestrator.close()
         logger.info("Application shutdown complete")
 
 
 def run():
     """Run the application"""
     try:
-        asyncio.run(main())
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Application stopped by user")
     except Exception as e:
-        logger.error(f"Fatal error: {str(e)}")
+        logger.error("Fatal error: {}", e)
         sys.exit(1)
 
 
@@ -3,8 +3,15 @@ Orchestrator
 Main orchestration engine that coordinates all agents and services
 """
 import asyncio
-from typing import Dict, Any, List
-from agents import get_classification_agent, get_task_creation_agent, get_task_execution_agent
+import inspect
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple
+from agents import (
+    get_classification_agent,
+    get_task_creation_agent,
+    get_task_execution_agent,
+    get_classify_and_create_agent,
+)
 from services import get_message_pull_service
 from utils.logger import get_logger
 from config.settings import settings
@@ -12,6 +19,32 @@ from config.settings import settings
 logger = get_logger(__name__)
 
 
+def _email_response_metadata(message: Dict[str, Any], execution_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Reply subject threaded on the original email's subject"""
+    original_subject = (message.get('metadata') or {}).get('subject')
+    return {"subject": f"Re: {original_subject}" if original_subject else "Response to your inquiry"}
+
+
+def _teams_response_metadata(message: Dict[str, Any], execution_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Card title and color type from the execution status"""
+    return {
+        "title": "Task Update",
+        "type": 'success' if execution_result.get('execution_status') == 'success' else 'error'
+    }
+
+
+def _is_low_priority(message: Dict[str, Any]) -> bool:
+    """Check whether a message is tagged for bulk processing through the Batch API"""
+    return (message.get('metadata') or {}).get('priority') == 'low'
+
+
+# Response metadata builders by channel; other channels send no metadata
+_RESPONSE_METADATA_BUILDERS = {
+    'email': _email_response_metadata,
+    'teams': _teams_response_metadata,
+}
+
+
 class Orchestrator:
     """
     Main orchestrator for the AI Multi-Agent System
@@ -22,138 +55,308 @@ class Orchestrator:
         self.classification_agent = get_classification_agent()
         self.task_creation_agent = get_task_creation_agent()
         self.task_execution_agent = get_task_execution_agent()
+        self.fuse_stages = settings.app.fuse_classification_and_task
+        self.classify_and_create_agent = get_classify_and_create_agent() if self.fuse_stages else None
         self.message_service = get_message_pull_service()
         self.max_concurrent_tasks = settings.app.max_concurrent_tasks
-        self.semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        self.message_timeout = settings.app.message_timeout
+        # Separate limits for the LLM stages (classification, task creation) and the
+        # execution stages (IDIT call, reply, send), so a message waiting on IDIT
+        # doesn't hold a slot the next message needs for classification
+        self.prepare_semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        self.execute_semaphore = asyncio.Semaphore(self.max_concurrent_tasks)
+        # Background Batch API jobs for low-priority messages (kept referenced until done)
+        self._bulk_jobs: Set[asyncio.Task] = set()
+        # Optional hook receiving the results of each background Batch API job, since
+        # they never appear in what process_messages/stream_messages return
+        self.on_bulk_results: Optional[Callable[[List[Dict[str, Any]]], Optional[Awaitable[None]]]] = None
     
-    async def process_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+    async def process_message(
+        self,
+        message: Dict[str, Any],
+        classification: Optional[Awaitable[Optional[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
         """
         Process a single message through the full pipeline
         
         Args:
             message: Standardized message dictionary
+            classification: Awaitable resolving to a classification produced elsewhere
+                (e.g. streamed by process_messages); the message is classified here
+                when omitted or when it resolves to None
         
         Returns:
             Processing result with status and response
         """
-        async with self.semaphore:
-            try:
-                logger.info(f"Processing message {message.get('message_id')} from {message.get('channel')}")
-                
-                # Stage 1: Classification
-                classification_result = await self._classify_message(message)
+        message_id, channel = message.get('message_id'), message.get('channel')
+        
+        try:
+            logger.info("Processing message {} from {}", message_id, channel)
+            
+            # A streamed classification is awaited before taking a slot; it costs no local work
+            classification_result = await classification if classification is not None else None
+            
+            # End-to-end time budget for the stages, so a slow LLM or IDIT call can't
+            # pin a slot indefinitely
+            async with asyncio.timeout(None) as budget:
+                async with self.prepare_semaphore:
+                    # The budget starts once the message gets its first slot, so time
+                    # spent queueing behind a large batch doesn't count against it
+                    if self.message_timeout:
+                        budget.reschedule(asyncio.get_running_loop().time() + self.message_timeout)
+                    
+                    if self.fuse_stages:
+                        # Stages 1-2: Classification and Task Creation in a single LLM call
+                        classification_result, task_data = await self._classify_and_create(message)
+                    else:
+                        # Stage 1: Classification
+                        if not classification_result:
+                            classification_result = await self._classify_message(message)
+                        
+                        # Stage 2: Task Creation
+                        task_data = await self._create_task(classification_result, message) if classification_result else None
                 
                 if not classification_result:
                     logger.error("Classification failed")
                     return self._create_error_result(message, "Classification failed")
                 
-                # Stage 2: Task Creation
-                task_data = await self._create_task(classification_result, message)
-                
                 if not task_data:
                     logger.error("Task creation failed")
                     return self._create_error_result(message, "Task creation failed")
                 
-                # Stage 3: Task Execution
-                execution_result = await self._execute_task(task_data, message)
-                
-                # Stage 4: Send Response
-                response_sent = await self._send_response(execution_result, message)
-                
-                # Compile final result
-                result = {
-                    "status": "success" if execution_result.get("execution_status") == "success" else "failed",
-                    "message_id": message.get('message_id'),
-                    "channel": message.get('channel'),
-                    "classification": classification_result,
-                    "task": task_data,
-                    "execution": execution_result,
-                    "response_sent": response_sent
-                }
-                
-                logger.info(f"Message {message.get('message_id')} processed successfully")
-                return result
-                
-            except Exception as e:
-                logger.error(f"Error processing message {message.get('message_id')}: {str(e)}")
-                return self._create_error_result(message, str(e))
+                async with self.execute_semaphore:
+                    # Stage 3: Task Execution
+                    execution_result = await self._execute_task(task_data, message)
+                    
+                    # Stage 4: Send Response
+                    response_sent = await self._send_response(execution_result, message)
+            
+            # Compile final result
+            result = self._create_result(message, classification_result, task_data, execution_result, response_sent)
+            
+            logger.info("Message {} processed successfully", message_id)
+            return result
+            
+        except TimeoutError:
+            logger.error("Message {} exceeded its {}s processing budget", message_id, self.message_timeout)
+            return self._create_error_result(message, "Processing time budget exceeded")
+        except Exception as e:
+            logger.error("Error processing message {}: {}", message_id, e)
+            return self._create_error_result(message, str(e))
     
     async def process_messages(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Process multiple messages concurrently
         
+        Messages flow through the stages as a pipeline: while one message is being
+        executed against IDIT, the next ones are already being classified and turned
+        into tasks, each stage bounded by its own concurrency limit.
+        
+        Messages tagged metadata['priority'] == 'low' are handed to process_bulk in
+        the background and have no entry in the returned results; their results go to
+        on_bulk_results when it is set. No channel sets this tag on its own: it is for
+        API callers that build messages themselves.
+        
         Args:
             messages: List of standardized messages
         
         Returns:
             List of processing results
         """
-        logger.info(f"Processing {len(messages)} messages")
+        messages = self._route_low_priority(messages)
+        logger.info("Processing {} messages", len(messages))
         
-        tasks = [self.process_message(msg) for msg in messages]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        async with asyncio.TaskGroup() as group:
+            tasks = self._start_pipeline(group, messages)
         
-        # Handle any exceptions
-        processed_results = []
-        for idx, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"Error processing message {idx}: {str(result)}")
-                processed_results.append(self._create_error_result(messages[idx], str(result)))
-            else:
-                processed_results.append(result)
+        return [task.result() for task in tasks]
+    
+    async def stream_messages(self, messages: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process multiple messages concurrently, yielding each result as soon as it is ready
+        
+        Same pipeline (and low-priority routing) as process_messages, but callers
+        can act on fast messages without waiting for the slowest one in the batch.
+        
+        Args:
+            messages: List of standardized messages
+        
+        Yields:
+            Processing results, in completion order
+        """
+        messages = self._route_low_priority(messages)
+        logger.info("Processing {} messages", len(messages))
         
-        return processed_results
+        async with asyncio.TaskGroup() as group:
+            try:
+                for next_done in asyncio.as_completed(self._start_pipeline(group, messages)):
+                    yield await next_done
+            except GeneratorExit:
+                # Caller stopped early: let messages already in flight finish
+                # instead of cancelling them halfway through the pipeline
+                return
+    
+    async def process_bulk(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Process non-urgent messages with classification and task creation batched
+        through the Azure OpenAI Batch API
+        
+        Cheaper and outside the real-time rate limits, but a batch job can take up to
+        AZURE_OPENAI_BATCH_MAX_WAIT seconds; messages tagged urgent still go through
+        the real-time path. Tasks are then executed and answered as usual.
+        
+        Called directly by API callers, or in the background by process_messages and
+        stream_messages for messages tagged metadata['priority'] == 'low'.
+        
+        Args:
+            messages: List of standardized messages
+        
+        Returns:
+            List of processing results
+        """
+        logger.info("Processing {} messages through the Batch API", len(messages))
+        
+        classifications = await self.classification_agent.classify_batch(messages)
+        tasks = await self.task_creation_agent.create_task_batch(classifications, messages)
+        
+        return await asyncio.gather(*(
+            self._execute_and_respond(message, classification, task_data)
+            for message, classification, task_data in zip(messages, classifications, tasks)
+        ))
+    
+    async def _execute_and_respond(
+        self,
+        message: Dict[str, Any],
+        classification: Dict[str, Any],
+        task_data: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Run the execution and response stages for a message prepared by process_bulk"""
+        if not task_data:
+            return self._create_error_result(message, "Task creation failed")
+        
+        async with self.execute_semaphore:
+            execution_result = await self._execute_task(task_data, message)
+            response_sent = await self._send_response(execution_result, message)
+        
+        return self._create_result(message, classification, task_data, execution_result, response_sent)
+    
+    def _route_low_priority(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Start a background process_bulk job for low-priority messages and return the rest"""
+        low_priority = [message for message in messages if _is_low_priority(message)]
+        if not low_priority:
+            return messages
+        
+        job = asyncio.create_task(self._run_bulk_job(low_priority))
+        self._bulk_jobs.add(job)
+        job.add_done_callback(self._bulk_jobs.discard)
+        
+        return [message for message in messages if not _is_low_priority(message)]
+    
+    async def _run_bulk_job(self, messages: List[Dict[str, Any]]):
+        """Run process_bulk in the background, log each result and pass them to on_bulk_results"""
+        try:
+            results = await self.process_bulk(messages)
+        except Exception as e:
+            logger.error("Batch API job for {} messages failed: {}", len(messages), e)
+            return
+        
+        for result in results:
+            logger.info(
+                "Batch API result for message {} ({}): {}",
+                result.get('message_id'), result.get('channel'), result.get('status')
+            )
+        succeeded = sum(result.get('status') == 'success' for result in results)
+        logger.info("Batch API job finished: {}/{} messages succeeded", succeeded, len(results))
+        
+        if self.on_bulk_results is None:
+            return
+        try:
+            outcome = self.on_bulk_results(results)
+            if inspect.isawaitable(outcome):
+                await outcome
+        except Exception as e:
+            logger.error("on_bulk_results callback failed: {}", e)
+    
+    def _start_pipeline(self, group: asyncio.TaskGroup, messages: List[Dict[str, Any]]) -> List[asyncio.Task]:
+        """Start one process_message task per message in the group, in message order"""
+        # Classify the whole batch in as few LLM calls as possible; each message moves on
+        # to task creation as soon as its own classification has streamed in
+        if self.fuse_stages or len(messages) < 2:
+            classifications = [None] * len(messages)
+        else:
+            loop = asyncio.get_running_loop()
+            classifications = [loop.create_future() for _ in messages]
+            group.create_task(self._stream_classifications(messages, classifications))
+        
+        return [
+            group.create_task(self.process_message(msg, classification))
+            for msg, classification in zip(messages, classifications)
+        ]
     
     async def _classify_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Run message through classification agent"""
         try:
-            logger.info(f"Classifying message {message.get('message_id')}")
-            
-            # Run classification in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            classification = await loop.run_in_executor(
-                None,
-                self.classification_agent.classify_message,
-                message
-            )
+            logger.info("Classifying message {}", message.get('message_id'))
+            
+            classification = await self.classification_agent.aclassify_message(message)
             
             return classification
             
         except Exception as e:
-            logger.error(f"Classification error: {str(e)}")
+            logger.error("Classification error: {}", e)
             return None
     
+    async def _stream_classifications(self, messages: List[Dict[str, Any]], futures: List[asyncio.Future]):
+        """Run a batch of messages through classification agent, resolving each future as its result arrives"""
+        try:
+            logger.info("Classifying {} messages", len(messages))
+            
+            async for idx, classification in self.classification_agent.astream_classifications(messages):
+                futures[idx].set_result(classification)
+            
+        except Exception as e:
+            logger.error("Batch classification error: {}", e)
+        finally:
+            # Unresolved messages are classified individually by process_message
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+    
     async def _create_task(self, classification: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
         """Create task from classification result"""
         try:
-            logger.info(f"Creating task for action_id: {classification.get('action_id')}")
-            
-            # Run task creation in executor
-            loop = asyncio.get_event_loop()
-            task_data = await loop.run_in_executor(
-                None,
-                self.task_creation_agent.create_task,
-                classification,
-                message
-            )
+            logger.info("Creating task for action_id: {}", classification.get('action_id'))
+            
+            task_data = await self.task_creation_agent.acreate_task(classification, message)
             
             return task_data
             
         except Exception as e:
-            logger.error(f"Task creation error: {str(e)}")
+            logger.error("Task creation error: {}", e)
             return None
     
+    async def _classify_and_create(self, message: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Classify a message and create its task with the fused agent"""
+        try:
+            logger.info("Classifying and creating task for message {}", message.get('message_id'))
+            
+            return await self.classify_and_create_agent.aclassify_and_create(message)
+            
+        except Exception as e:
+            logger.error("Classification and task creation error: {}", e)
+            return None, None
+    
     async def _execute_task(self, task_data: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, Any]:
         """Execute task via IDIT API"""
         try:
-            logger.info(f"Executing task {task_data.get('task_id')}")
+            logger.info("Executing task {}", task_data.get('task_id'))
             
             execution_result = await self.task_execution_agent.execute_task(task_data, message)
             
             return execution_result
             
         except Exception as e:
-            logger.error(f"Task execution error: {str(e)}")
+            logger.error("Task execution error: {}", e)
             return {
                 "execution_status": "failed",
                 "error": str(e),
@@ -164,17 +367,18 @@ class Orchestrator:
         """Send response back to user via appropriate channel"""
         try:
             channel = message.get('channel')
+            
+            # Internal, replayed and test messages have nobody to reply to
+            if (message.get('metadata') or {}).get('internal') or not self.message_service.can_send(channel):
+                logger.debug("Skipping response for message {} (channel: {})", message.get('message_id'), channel)
+                return False
+            
             sender = message.get('sender')
             response_text = execution_result.get('user_response', 'Your request has been processed.')
             
             # Prepare metadata based on channel
-            metadata = {}
-            if channel == 'email':
-                original_subject = message.get('metadata', {}).get('subject', '')
-                metadata['subject'] = f"Re: {original_subject}" if original_subject else "Response to your inquiry"
-            elif channel == 'teams':
-                metadata['title'] = "Task Update"
-                metadata['type'] = 'success' if execution_result.get('execution_status') == 'success' else 'error'
+            build_metadata = _RESPONSE_METADATA_BUILDERS.get(channel)
+            metadata = build_metadata(message, execution_result) if build_metadata else {}
             
             # Send response
             success = await self.message_service.send_response(
@@ -185,16 +389,35 @@ class Orchestrator:
             )
             
             if success:
-                logger.info(f"Response sent successfully to {sender} via {channel}")
+                logger.info("Response sent successfully to {} via {}", sender, channel)
             else:
-                logger.warning(f"Failed to send response to {sender} via {channel}")
+                logger.warning("Failed to send response to {} via {}", sender, channel)
             
             return success
             
         except Exception as e:
-            logger.error(f"Error sending response: {str(e)}")
+            logger.error("Error sending response: {}", e)
             return False
     
+    def _create_result(
+        self,
+        message: Dict[str, Any],
+        classification: Dict[str, Any],
+        task_data: Dict[str, Any],
+        execution_result: Dict[str, Any],
+        response_sent: bool
+    ) -> Dict[str, Any]:
+        """Create result for a message that went through all stages"""
+        return {
+            "status": "success" if execution_result.get("execution_status") == "success" else "failed",
+            "message_id": message.get('message_id'),
+            "channel": message.get('channel'),
+            "classification": classification,
+            "task": task_data,
+            "execution": execution_result,
+            "response_sent": response_sent
+        }
+    
     def _create_error_result(self, message: Dict[str, Any], error: str) -> Dict[str, Any]:
         """Create error result"""
         return {
@@ -220,21 +443,37 @@ class Orchestrator:
             logger.info("Received shutdown signal")
             self.stop()
         except Exception as e:
-            logger.error(f"Orchestrator error: {str(e)}")
+            logger.error("Orchestrator error: {}", e)
             raise
     
     def stop(self):
         """Stop the orchestrator"""
         logger.info("Stopping AI Multi-Agent Orchestration System")
         self.message_service.stop_polling()
+    
+    async def close(self):
+        """Cancel unfinished Batch API jobs and close channel and IDIT API connections"""
+        if self._bulk_jobs:
+            logger.warning("Cancelling {} unfinished Batch API jobs", len(self._bulk_jobs))
+            for job in list(self._bulk_jobs):
+                job.cancel()
+            await asyncio.gather(*self._bulk_jobs, return_exceptions=True)
+        
+        await asyncio.gather(
+            self.message_service.close(),
+            self.task_execution_agent.idit_client.close()
+        )
 
 
 # Singleton instance
 _orchestrator = None
+_orchestrator_lock = threading.Lock()
 
 def get_orchestrator() -> Orchestrator:
     """Get or create orchestrator singleton"""
     global _orchestrator
     if _orchestrator is None:
-        _orchestrator = Orchestrator()
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = Orchestrator()
     return _orchestrator
@@ -1,10 +1,12 @@
 """Services package initialization"""
 from .idit_api_client import get_idit_client, IDITAPIClient
 from .message_pull_service import get_message_pull_service, MessagePullService
+from .azure_batch_client import AzureBatchClient
 
 __all__ = [
     "get_idit_client",
     "IDITAPIClient",
     "get_message_pull_service",
     "MessagePullService",
+    "AzureBatchClient",
 ]
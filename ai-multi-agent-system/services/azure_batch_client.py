@@ -0,0 +1,113 @@
+"""
+Azure OpenAI Batch Client
+Runs chat completion requests through the Azure OpenAI Batch API
+"""
+import asyncio
+import orjson
+from typing import Dict, Any
+from openai import AsyncAzureOpenAI
+from config.settings import settings
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class AzureBatchClient:
+    """
+    Client for the Azure OpenAI Batch API
+    Batch jobs bypass the real-time RPM limits at a lower price, but Azure only
+    guarantees completion within 24 hours, so use it for non-urgent work only.
+    """
+    
+    def __init__(self, client: AsyncAzureOpenAI):
+        self.client = client
+        self.deployment_name = settings.azure_openai.batch_deployment_name or settings.azure_openai.deployment_name
+        self.poll_interval = settings.azure_openai.batch_poll_interval
+        self.max_wait = settings.azure_openai.batch_max_wait
+    
+    async def run_chat_batch(self, requests: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Submit chat completion requests as one batch job and wait for the results
+        
+        Args:
+            requests: Chat completion request bodies keyed by custom_id
+        
+        Returns:
+            Completion message content keyed by custom_id.
+            Requests that failed inside the batch are omitted, and a job still
+            running after max_wait seconds is cancelled and returns no results.
+        """
+        if not requests:
+            return {}
+        
+        input_file = await self.client.files.create(
+            file=("batch_input.jsonl", self._build_jsonl(requests)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("Submitted batch {} with {} requests", batch.id, len(requests))
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        
+        while batch.status not in TERMINAL_STATUSES:
+            if loop.time() >= deadline:
+                logger.error("Batch {} still {} after {}s, cancelling", batch.id, batch.status, self.max_wait)
+                try:
+                    await self.client.batches.cancel(batch.id)
+                except Exception as e:
+                    logger.error("Error cancelling batch {}: {}", batch.id, e)
+                return {}
+            
+            await asyncio.sleep(min(self.poll_interval, max(0, deadline - loop.time())))
+            batch = await self.client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed":
+            logger.warning("Batch {} finished with status: {}", batch.id, batch.status)
+        
+        if not batch.output_file_id:
+            return {}
+        
+        output = await self.client.files.content(batch.output_file_id)
+        results = self._parse_output(output.text)
+        
+        logger.info("Batch {} returned {}/{} results", batch.id, len(results), len(requests))
+        return results
+    
+    def _build_jsonl(self, requests: Dict[str, Dict[str, Any]]) -> bytes:
+        """Build the JSONL input file, one chat completion request per line"""
+        lines = [
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {"model": self.deployment_name, **body}
+            })
+            for custom_id, body in requests.items()
+        ]
+        return b"\n".join(lines)
+    
+    def _parse_output(self, output: str) -> Dict[str, str]:
+        """Parse the JSONL output file into completion content keyed by custom_id"""
+        results = {}
+        
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            
+            if record.get("error") or response.get("status_code") != 200:
+                logger.error("Batch request {} failed: {}", record.get('custom_id'), record.get('error'))
+                continue
+            
+            results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+        
+        return results
@@ -3,13 +3,73 @@ IDIT API Client
 Handles all communications with the IDIT external API
 """
 import httpx
+import threading
+import orjson
 from typing import Dict, Any, Optional
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 from config.settings import settings
+from utils.circuit_breaker import CircuitBreaker
 from utils.logger import get_logger
 import time
 
 logger = get_logger(__name__)
 
+SUPPORTED_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+# Accepted spellings of each supported method, so normalizing and validating is one lookup
+_METHOD_NAMES = {
+    **{method: method for method in SUPPORTED_METHODS},
+    **{method.lower(): method for method in SUPPORTED_METHODS}
+}
+
+# Headers sent with every IDIT request besides the bearer token
+_STATIC_HEADERS = (
+    ('Content-Type', 'application/json'),
+    ('User-Agent', 'AI-Multi-Agent-System/1.0'),
+)
+
+# IDIT endpoint paths
+HEALTH_ENDPOINT = "/health"
+POLICY_INQUIRY_ENDPOINT = "/api/v1/policies/inquiry"
+POLICY_UPDATE_ENDPOINT = "/api/v1/policies/update"
+CLAIM_SUBMIT_ENDPOINT = "/api/v1/claims/submit"
+CLAIM_STATUS_ENDPOINT = "/api/v1/claims/status/{}"
+PAYMENT_INQUIRY_ENDPOINT = "/api/v1/payments/inquiry"
+
+
+def _is_transient_failure(retry_state) -> bool:
+    """
+    Decide whether an IDIT request attempt is worth retrying
+    
+    Connection failures are retried for every method, since the request never
+    reached IDIT. Timeouts, dropped connections and 5xx responses are only retried
+    for idempotent methods, so a slow POST can't submit the same claim twice.
+    """
+    # _send(self, method, ...): method may be passed positionally or by keyword
+    if 'method' in retry_state.kwargs:
+        method = retry_state.kwargs['method']
+    else:
+        method = retry_state.args[1]
+    idempotent = method != 'POST'
+    if retry_state.outcome.failed:
+        error = retry_state.outcome.exception()
+        return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)) or (
+            idempotent and isinstance(error, httpx.TransportError)
+        )
+    return idempotent and retry_state.outcome.result().status_code >= 500
+
+
+idit_retry = retry(
+    wait=wait_exponential_jitter(initial=0.5, max=10),
+    stop=stop_after_attempt(settings.app.max_retries if settings.app.enable_retry else 1),
+    retry=_is_transient_failure,
+    before_sleep=lambda state: logger.warning(
+        "Transient IDIT API failure, retrying (attempt {})", state.attempt_number
+    ),
+    # Once attempts run out, hand back the last 5xx response (or raise the last error)
+    retry_error_callback=lambda state: state.outcome.result(),
+)
+
 
 class IDITAPIClient:
     """Client for IDIT API integration"""
@@ -18,11 +78,24 @@ class IDITAPIClient:
         self.base_url = settings.idit_api.base_url
         self.api_key = settings.idit_api.api_key
         self.timeout = settings.idit_api.timeout
-        self.headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json',
-            'User-Agent': 'AI-Multi-Agent-System/1.0'
-        }
+        
+        # One pooled HTTP/2 client for all IDIT calls, so connections and TLS sessions are reused.
+        # Its default headers are encoded once here and sent with every request, so
+        # execute_action never passes headers of its own
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=(('Authorization', f'Bearer {self.api_key}'),) + _STATIC_HEADERS,
+            http2=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        
+        # Refuses calls for a while after repeated failures, so an IDIT outage doesn't
+        # make every message wait out its full timeout and retries
+        self._breaker = CircuitBreaker(
+            settings.idit_api.circuit_failure_threshold,
+            settings.idit_api.circuit_cooldown
+        )
     
     async def execute_action(
         self, 
@@ -51,66 +124,72 @@ class IDITAPIClient:
         start_time = time.time()
         
         try:
-            logger.info(f"Calling IDIT API: {method} {endpoint}")
+            logger.info("Calling IDIT API: {} {}", method, endpoint)
+            
+            normalized_method = _METHOD_NAMES.get(method) or _METHOD_NAMES.get(method.upper())
+            if normalized_method is None:
+                raise ValueError(f"Unsupported HTTP method: {method}")
+            method = normalized_method
+            
+            if not self._breaker.allow_request():
+                logger.warning("IDIT API circuit open, skipping {} {}", method, endpoint)
+                return self._create_error_response("IDIT API temporarily unavailable", 503, time.time() - start_time)
+            
+            try:
+                response = await self._send(method, endpoint, data, timeout or self.timeout)
+            except httpx.RequestError:
+                self._breaker.record_failure()
+                raise
+            
+            if response.status_code >= 500:
+                self._breaker.record_failure()
+            else:
+                self._breaker.record_success()
             
-            url = f"{self.base_url}{endpoint}"
-            request_timeout = timeout or self.timeout
+            execution_time = time.time() - start_time
+            
+            # Parse response
+            result = self._parse_response(response, execution_time)
+            
+            logger.info("IDIT API call completed: {} (took {:.2f}s)", result['success'], execution_time)
+            return result
             
-            async with httpx.AsyncClient() as client:
-                if method.upper() == 'GET':
-                    response = await client.get(
-                        url,
-                        headers=self.headers,
-                        params=data,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == 'POST':
-                    response = await client.post(
-                        url,
-                        headers=self.headers,
-                        json=data,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == 'PUT':
-                    response = await client.put(
-                        url,
-                        headers=self.headers,
-                        json=data,
-                        timeout=request_timeout
-                    )
-                elif method.upper() == 'DELETE':
-                    response = await client.delete(
-                        url,
-                        headers=self.headers,
-                        timeout=request_timeout
-                    )
-                else:
-                    raise ValueError(f"Unsupported HTTP method: {method}")
-                
-                execution_time = time.time() - start_time
-                
-                # Parse response
-                result = self._parse_response(response, execution_time)
-                
-                logger.info(f"IDIT API call completed: {result['success']} (took {execution_time:.2f}s)")
-                return result
-                
         except httpx.TimeoutException as e:
-            logger.error(f"IDIT API timeout: {str(e)}")
+            logger.error("IDIT API timeout: {}", e)
             return self._create_error_response("Request timeout", 408, time.time() - start_time)
         except httpx.RequestError as e:
-            logger.error(f"IDIT API request error: {str(e)}")
+            logger.error("IDIT API request error: {}", e)
             return self._create_error_response(str(e), 500, time.time() - start_time)
         except Exception as e:
-            logger.error(f"IDIT API unexpected error: {str(e)}")
+            logger.error("IDIT API unexpected error: {}", e)
             return self._create_error_response(str(e), 500, time.time() - start_time)
     
+    @idit_retry
+    async def _send(self, method: str, endpoint: str, data: Optional[Dict[str, Any]], timeout: float) -> httpx.Response:
+        """Send one IDIT request, retrying transient failures"""
+        # GET sends data as query parameters, POST/PUT as a JSON body (serialized with
+        # orjson; the client's headers already set the content type), DELETE sends none
+        return await self._client.request(
+            method,
+            endpoint,
+            params=data if method == 'GET' else None,
+            content=orjson.dumps(data) if method in ('POST', 'PUT') and data is not None else None,
+            timeout=timeout
+        )
+    
     def _parse_response(self, response: httpx.Response, execution_time: float) -> Dict[str, Any]:
         """Parse HTTP response into standardized format"""
-        try:
-            response_data = response.json() if response.text else {}
-        except:
-            response_data = {"raw_response": response.text}
+        content = response.content
+        if not content:
+            response_data = {}
+        elif 'json' not in response.headers.get('content-type', ''):
+            # Non-JSON bodies (HTML error pages from proxies, plain text) skip the parser
+            response_data = {"raw_response": content.decode('utf-8', 'replace')}
+        else:
+            try:
+                response_data = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                response_data = {"raw_response": content.decode('utf-8', 'replace')}
         
         success = 200 <= response.status_code < 300
         
@@ -132,13 +211,17 @@ class IDITAPIClient:
             "execution_time": execution_time
         }
     
+    async def close(self):
+        """Close the pooled HTTP client"""
+        await self._client.aclose()
+    
     async def health_check(self) -> bool:
         """Check IDIT API health"""
         try:
-            result = await self.execute_action("/health", method="GET")
+            result = await self.execute_action(HEALTH_ENDPOINT, method="GET")
             return result["success"]
         except Exception as e:
-            logger.error(f"IDIT API health check failed: {str(e)}")
+            logger.error("IDIT API health check failed: {}", e)
             return False
     
     async def submit_policy_inquiry(self, customer_id: str, policy_number: str, inquiry_details: Dict[str, Any]) -> Dict[str, Any]:
@@ -149,7 +232,7 @@ class IDITAPIClient:
             "inquiry_type": inquiry_details.get("type", "general"),
             "details": inquiry_details
         }
-        return await self.execute_action("/api/v1/policies/inquiry", data=data)
+        return await self.execute_action(POLICY_INQUIRY_ENDPOINT, data=data)
     
     async def submit_claim(self, customer_id: str, policy_number: str, claim_data: Dict[str, Any]) -> Dict[str, Any]:
         """Submit a new claim"""
@@ -162,11 +245,11 @@ class IDITAPIClient:
             "amount": claim_data.get("amount"),
             "attachments": claim_data.get("attachments", [])
         }
-        return await self.execute_action("/api/v1/claims/submit", data=data)
+        return await self.execute_action(CLAIM_SUBMIT_ENDPOINT, data=data)
     
     async def get_claim_status(self, claim_id: str) -> Dict[str, Any]:
         """Get claim status"""
-        return await self.execute_action(f"/api/v1/claims/status/{claim_id}", method="GET")
+        return await self.execute_action(CLAIM_STATUS_ENDPOINT.format(claim_id), method="GET")
     
     async def update_policy(self, policy_number: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update policy details"""
@@ -174,7 +257,7 @@ class IDITAPIClient:
             "policy_number": policy_number,
             "updates": update_data
         }
-        return await self.execute_action("/api/v1/policies/update", method="PUT", data=data)
+        return await self.execute_action(POLICY_UPDATE_ENDPOINT, method="PUT", data=data)
     
     async def get_payment_info(self, customer_id: str, policy_number: str) -> Dict[str, Any]:
         """Get payment information"""
@@ -182,15 +265,18 @@ class IDITAPIClient:
             "customer_id": customer_id,
             "policy_number": policy_number
         }
-        return await self.execute_action("/api/v1/payments/inquiry", method="GET", data=data)
+        return await self.execute_action(PAYMENT_INQUIRY_ENDPOINT, method="GET", data=data)
 
 
 # Singleton instance
 _idit_client = None
+_idit_client_lock = threading.Lock()
 
 def get_idit_client() -> IDITAPIClient:
     """Get or create IDIT API client singleton"""
     global _idit_client
     if _idit_client is None:
-        _idit_client = IDITAPIClient()
+        with _idit_client_lock:
+            if _idit_client is None:
+                _idit_client = IDITAPIClient()
     return _idit_client
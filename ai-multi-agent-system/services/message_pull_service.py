@@ -3,13 +3,17 @@ Message Pull Service
 Coordinates message retrieval from all channels
 """
 import asyncio
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Optional
 from channels import get_email_handler, get_whatsapp_handler, get_teams_handler
 from utils.logger import get_logger
 from config.settings import settings
 
 logger = get_logger(__name__)
 
+# Bursts stop being coalesced once they reach this size (one classification prompt's worth)
+COALESCE_BATCH_SIZE = 20
+
 
 class MessagePullService:
     """Service for pulling messages from all channels"""
@@ -18,7 +22,20 @@ class MessagePullService:
         self.email_handler = get_email_handler()
         self.whatsapp_handler = get_whatsapp_handler()
         self.teams_handler = get_teams_handler()
+        
+        # Channel name -> handler method, so dispatch is a single dict lookup
+        self._pullers = {
+            'email': self.email_handler.pull_messages,
+            'whatsapp': self.whatsapp_handler.pull_messages,
+            'teams': self.teams_handler.pull_messages
+        }
+        self._senders = {
+            'email': self.email_handler.send_message,
+            'whatsapp': self.whatsapp_handler.send_message,
+            'teams': self.teams_handler.send_message
+        }
         self.poll_interval = settings.app.message_poll_interval
+        self.coalesce_window = settings.app.poll_coalesce_window
         self.is_running = False
     
     async def pull_all_messages(self) -> List[Dict[str, Any]]:
@@ -31,30 +48,40 @@ class MessagePullService:
         try:
             logger.info("Pulling messages from all channels...")
             
-            # Pull messages from all channels concurrently
-            results = await asyncio.gather(
-                self.email_handler.pull_messages(),
-                self.whatsapp_handler.pull_messages(),
-                self.teams_handler.pull_messages(),
-                return_exceptions=True
-            )
-            
-            # Combine all messages
-            all_messages = []
-            for idx, result in enumerate(results):
-                if isinstance(result, Exception):
-                    channel_name = ['email', 'whatsapp', 'teams'][idx]
-                    logger.error(f"Error pulling from {channel_name}: {str(result)}")
-                else:
-                    all_messages.extend(result)
+            all_messages = await self._pull_channels(list(self._pullers))
             
-            logger.info(f"Pulled {len(all_messages)} total messages from all channels")
+            logger.info("Pulled {} total messages from all channels", len(all_messages))
             return all_messages
             
         except Exception as e:
-            logger.error(f"Error in pull_all_messages: {str(e)}")
+            logger.error("Error in pull_all_messages: {}", e)
             return []
     
+    async def _pull_channels(self, channel_names: List[str]) -> List[Dict[str, Any]]:
+        """Pull the given channels concurrently and combine their messages"""
+        results = await asyncio.gather(
+            *(self._pullers[channel_name]() for channel_name in channel_names),
+            return_exceptions=True
+        )
+        
+        # Combine all messages, dropping duplicates of the same channel message
+        all_messages = []
+        seen = set()
+        for channel_name, result in zip(channel_names, results):
+            if isinstance(result, Exception):
+                logger.error("Error pulling from {}: {}", channel_name, result)
+                continue
+            
+            for message in result:
+                # Prefer the id hash computed once by the channel parser
+                metadata = message.get('metadata') or {}
+                key = (message.get('channel'), metadata.get('id_hash64', message.get('message_id')))
+                if key not in seen:
+                    seen.add(key)
+                    all_messages.append(message)
+        
+        return all_messages
+    
     async def pull_from_channel(self, channel_name: str) -> List[Dict[str, Any]]:
         """
         Pull messages from a specific channel
@@ -66,20 +93,17 @@ class MessagePullService:
             List of messages from the specified channel
         """
         try:
-            logger.info(f"Pulling messages from {channel_name}...")
+            logger.info("Pulling messages from {}...", channel_name)
             
-            if channel_name.lower() == 'email':
-                return await self.email_handler.pull_messages()
-            elif channel_name.lower() == 'whatsapp':
-                return await self.whatsapp_handler.pull_messages()
-            elif channel_name.lower() == 'teams':
-                return await self.teams_handler.pull_messages()
-            else:
-                logger.warning(f"Unknown channel: {channel_name}")
+            pull = self._pullers.get(channel_name.lower())
+            if pull is None:
+                logger.warning("Unknown channel: {}", channel_name)
                 return []
+            
+            return await pull()
                 
         except Exception as e:
-            logger.error(f"Error pulling from {channel_name}: {str(e)}")
+            logger.error("Error pulling from {}: {}", channel_name, e)
             return []
     
     async def start_polling(self, callback):
@@ -90,30 +114,74 @@ class MessagePullService:
             callback: Async function to call with new messages
         """
         self.is_running = True
-        logger.info(f"Starting message polling (interval: {self.poll_interval}s)")
+        logger.info("Starting message polling (interval: {}s)", self.poll_interval)
         
         while self.is_running:
             try:
                 # Pull messages
-                messages = await self.pull_all_messages()
+                messages = await self._coalesce(await self.pull_all_messages())
                 
                 # Process messages if any found
                 if messages:
-                    logger.info(f"Processing {len(messages)} new messages")
+                    logger.info("Processing {} new messages", len(messages))
                     await callback(messages)
                 
                 # Wait before next poll
                 await asyncio.sleep(self.poll_interval)
                 
             except Exception as e:
-                logger.error(f"Error in polling loop: {str(e)}")
+                logger.error("Error in polling loop: {}", e)
                 await asyncio.sleep(self.poll_interval)
     
+    async def _coalesce(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Grow a small batch with messages that arrive shortly after it
+        
+        After each coalescing window, re-polls only the channels that just returned
+        messages (idle channels wait for the next poll), for as long as they keep
+        returning messages and the batch is below COALESCE_BATCH_SIZE, so bursts
+        trickling in are classified together instead of one LLM call each.
+        
+        Args:
+            messages: Messages from the latest pull
+        
+        Returns:
+            The messages, plus any pulled during the window
+        """
+        if self.coalesce_window <= 0:
+            return messages
+        
+        latest = messages
+        while latest and len(messages) < COALESCE_BATCH_SIZE:
+            latest_channels = {message.get('channel') for message in latest}
+            active = [channel_name for channel_name in self._pullers if channel_name in latest_channels]
+            if not active:
+                break
+            
+            await asyncio.sleep(self.coalesce_window)
+            latest = await self._pull_channels(active)
+            messages.extend(latest)
+        
+        return messages
+    
     def stop_polling(self):
         """Stop the polling loop"""
         logger.info("Stopping message polling")
         self.is_running = False
     
+    async def close(self):
+        """Close connections held by all channel handlers"""
+        await asyncio.gather(
+            self.email_handler.close(),
+            self.whatsapp_handler.close(),
+            self.teams_handler.close(),
+            return_exceptions=True
+        )
+    
+    def can_send(self, channel: Optional[str]) -> bool:
+        """Return whether responses can be sent on the given channel"""
+        return bool(channel) and channel.lower() in self._senders
+    
     async def send_response(self, channel: str, recipient: str, content: str, metadata: Dict[str, Any] = None) -> bool:
         """
         Send a response message to the appropriate channel
@@ -128,29 +196,29 @@ class MessagePullService:
             True if sent successfully, False otherwise
         """
         try:
-            logger.info(f"Sending response via {channel} to {recipient}")
+            logger.info("Sending response via {} to {}", channel, recipient)
             
-            if channel.lower() == 'email':
-                return await self.email_handler.send_message(recipient, content, metadata)
-            elif channel.lower() == 'whatsapp':
-                return await self.whatsapp_handler.send_message(recipient, content, metadata)
-            elif channel.lower() == 'teams':
-                return await self.teams_handler.send_message(recipient, content, metadata)
-            else:
-                logger.warning(f"Unknown channel for sending: {channel}")
+            send = self._senders.get(channel.lower())
+            if send is None:
+                logger.warning("Unknown channel for sending: {}", channel)
                 return False
+            
+            return await send(recipient, content, metadata)
                 
         except Exception as e:
-            logger.error(f"Error sending response via {channel}: {str(e)}")
+            logger.error("Error sending response via {}: {}", channel, e)
             return False
 
 
 # Singleton instance
 _message_pull_service = None
+_message_pull_service_lock = threading.Lock()
 
 def get_message_pull_service() -> MessagePullService:
     """Get or create message pull service singleton"""
     global _message_pull_service
     if _message_pull_service is None:
-        _message_pull_service = MessagePullService()
+        with _message_pull_service_lock:
+            if _message_pull_service is None:
+                _message_pull_service = MessagePullService()
     return _message_pull_service
@@ -0,0 +1,40 @@
+"""
+Test suite for the standardized message type
+"""
+import pickle
+from channels.base_channel import StandardizedMessage
+
+
+def make_message(**overrides):
+    values = {
+        'message_id': 'test-001',
+        'channel': 'email',
+        'sender': 'customer@example.com',
+        'content': 'What is the status of claim CLM-123?',
+        'timestamp': '2025-11-03T10:00:00',
+        'metadata': {'subject': 'Claim Status'}
+    }
+    values.update(overrides)
+    return StandardizedMessage(**values)
+
+
+class TestStandardizedMessage:
+    """Test cases for StandardizedMessage"""
+    
+    def test_reads_like_a_dict(self):
+        """Test that existing dictionary-style access keeps working"""
+        message = make_message()
+        
+        assert message['channel'] == 'email'
+        assert message.get('sender') == 'customer@example.com'
+        assert message.get('missing', 'default') == 'default'
+        assert message.get('metadata', {}).get('subject') == 'Claim Status'
+        assert {**message, 'message_id': None}['message_id'] is None
+        assert message == dict(message)
+    
+    def test_slots_and_pickling(self):
+        """Test that messages carry no per-instance dict and survive a process pool round trip"""
+        message = make_message()
+        
+        assert not hasattr(message, '__dict__')
+        assert pickle.loads(pickle.dumps(message)) == message
@@ -0,0 +1,56 @@
+"""
+Test suite for the circuit breaker
+"""
+import time
+from utils.circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker"""
+    
+    def test_opens_at_threshold(self):
+        """Test that calls are refused once enough failures happen in a row"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+        
+        breaker.record_failure()
+        assert breaker.allow_request()
+        
+        breaker.record_failure()
+        assert not breaker.allow_request()
+    
+    def test_success_resets_failures(self):
+        """Test that a success in between keeps the circuit closed"""
+        breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+        
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        
+        assert breaker.allow_request()
+    
+    def test_reopens_after_cooldown_failure(self):
+        """Test that a failed trial call after the cooldown reopens the circuit"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+        
+        breaker.record_failure()
+        assert breaker.is_open
+        
+        time.sleep(0.02)
+        assert breaker.allow_request()
+        
+        breaker.record_failure()
+        assert breaker.is_open
+    
+    def test_half_open_allows_single_trial(self):
+        """Test that only one trial call is let through after the cooldown"""
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+        
+        breaker.record_failure()
+        time.sleep(0.06)
+        
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+        
+        breaker.record_success()
+        assert breaker.allow_request()
+        assert breaker.allow_request()
@@ -43,11 +43,29 @@ class TestClassificationAgent:
     
     def test_fallback_classification(self, agent, sample_message):
         """Test fallback classification"""
-        fallback = agent._get_fallback_classification(sample_message)
+        fallback = agent.get_fallback_classification(sample_message)
         
         assert fallback['action_id'] == 'general_inquiry'
         assert fallback['confidence'] == 0.5
         assert 'ivo_attributes' in fallback
+    
+    def test_cached_classification_reused_across_senders(self, agent, sample_message):
+        """Test that repeated content from another sender is served from cache without their identifiers"""
+        classification = {
+            'action_id': 'claim_status',
+            'category': 'inquiry',
+            'ivo_attributes': {'customer_id': 'customer@example.com', 'policy_number': 'POL-1', 'extracted_entities': {'claim': 'CLM-12345'}},
+            'confidence': 0.9
+        }
+        agent._put_cached(sample_message, classification)
+        
+        other = {**sample_message, 'sender': 'other@example.com', 'content': '  I would like to check the STATUS of my claim #CLM-12345'}
+        cached = agent._get_cached(other)
+        
+        assert agent._get_cached(sample_message) == classification
+        assert cached['action_id'] == 'claim_status'
+        assert cached['ivo_attributes']['customer_id'] == 'other@example.com'
+        assert cached['ivo_attributes']['policy_number'] is None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+"""
+Test suite for clock utilities
+"""
+from utils.clock import iso_from_unix, utcnow_iso
+
+
+class TestClock:
+    """Test cases for timestamp formatting"""
+    
+    def test_iso_from_unix(self):
+        """Test that int and digit-string timestamps are formatted in UTC"""
+        assert iso_from_unix(1700000000) == "2023-11-14T22:13:20"
+        assert iso_from_unix("1700000000") == "2023-11-14T22:13:20"
+    
+    def test_invalid_timestamps(self):
+        """Test that missing or malformed timestamps are rejected"""
+        assert iso_from_unix(None) is None
+        assert iso_from_unix("not-a-time") is None
+        assert iso_from_unix(-5) is None
+    
+    def test_unrepresentable_timestamps(self):
+        """Test that out-of-range and non-ASCII digit timestamps return None instead of raising"""
+        assert iso_from_unix("99999999999999999999") is None
+        assert iso_from_unix("\u00b2") is None
+    
+    def test_utcnow_iso(self):
+        """Test that the current time is formatted to the second"""
+        assert len(utcnow_iso()) == len("2023-11-14T22:13:20")
@@ -0,0 +1,68 @@
+"""
+Test suite for deduplication utilities
+"""
+from utils.dedup import BoundedSet, RollingBloomFilter, create_dedup_filter, fast_message_id
+
+
+class TestBoundedSet:
+    """Test cases for BoundedSet"""
+    
+    def test_membership(self):
+        """Test that added keys are remembered"""
+        seen = BoundedSet(maxlen=10)
+        seen.add("<a@example.com>")
+        
+        assert "<a@example.com>" in seen
+        assert "<b@example.com>" not in seen
+    
+    def test_evicts_oldest(self):
+        """Test that the oldest key is dropped once the set is full"""
+        seen = BoundedSet(maxlen=2)
+        for key in ("a", "b", "a", "c"):
+            seen.add(key)
+        
+        assert len(seen) == 2
+        assert "b" not in seen
+        assert "a" in seen and "c" in seen
+    
+    def test_exact_strategy(self):
+        """Test that the exact strategy builds a BoundedSet with check_and_add"""
+        seen = create_dedup_filter("exact", capacity=2)
+        
+        assert isinstance(seen, BoundedSet)
+        assert seen.check_and_add("a") is False
+        assert seen.check_and_add("a") is True
+
+
+class TestRollingBloomFilter:
+    """Test cases for RollingBloomFilter"""
+    
+    def test_check_and_add(self):
+        """Test that a key is new the first time and seen afterwards"""
+        seen = RollingBloomFilter(capacity=100)
+        
+        assert seen.check_and_add("wamid.HBgLMTIzNDU2Nzg5MA") is False
+        assert seen.check_and_add("wamid.HBgLMTIzNDU2Nzg5MA") is True
+        assert "wamid.HBgLMTIzNDU2Nzg5MA" in seen
+    
+    def test_fast_message_id_keys(self):
+        """Test that a hashed id and its string form map to the same entry"""
+        seen = RollingBloomFilter(capacity=100)
+        key = fast_message_id("wamid.HBgLMTIzNDU2Nzg5MA")
+        
+        assert isinstance(key, int) and key < 2 ** 64
+        assert seen.check_and_add(key) is False
+        assert "wamid.HBgLMTIzNDU2Nzg5MA" in seen
+    
+    def test_rotation_keeps_recent_keys(self):
+        """Test that keys survive one rotation and are forgotten after two"""
+        seen = RollingBloomFilter(capacity=10)
+        seen.check_and_add("first")
+        
+        for idx in range(10):
+            seen.check_and_add(f"key-{idx}")
+        assert "first" in seen
+        
+        for idx in range(10, 30):
+            seen.check_and_add(f"key-{idx}")
+        assert "first" not in seen
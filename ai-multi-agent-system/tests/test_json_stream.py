@@ -0,0 +1,32 @@
+"""
+Test suite for JSON stream utilities
+"""
+import json
+from utils.json_stream import JSONArrayStreamParser
+
+
+class TestJSONArrayStreamParser:
+    """Test cases for JSONArrayStreamParser"""
+    
+    def test_items_emitted_as_completed(self):
+        """Test that each item is returned as soon as its closing brace arrives"""
+        document = json.dumps({"classifications": [{"action_id": "claim_status"}, {"action_id": "complaint"}]})
+        split = document.index("}") + 1
+        
+        parser = JSONArrayStreamParser("classifications")
+        
+        assert parser.feed(document[:split - 1]) == []
+        assert parser.feed(document[split - 1:split]) == [{"action_id": "claim_status"}]
+        assert parser.feed(document[split:]) == [{"action_id": "complaint"}]
+        assert parser.done
+    
+    def test_character_by_character(self):
+        """Test that feeding one character at a time yields every item once"""
+        items = [{"a": "x, y ] }"}, {"b": [1, 2]}, {"c": None}]
+        parser = JSONArrayStreamParser("items")
+        
+        received = []
+        for char in json.dumps({"items": items}):
+            received.extend(parser.feed(char))
+        
+        assert received == items
@@ -0,0 +1,44 @@
+"""
+Test suite for Outbound Batcher
+"""
+import asyncio
+from channels.outbound_batcher import OutboundBatcher
+
+
+class TestOutboundBatcher:
+    """Test cases for OutboundBatcher"""
+    
+    def test_concurrent_sends_share_a_batch(self):
+        """Test that concurrent submissions are sent together and get their own results"""
+        batches = []
+        
+        async def send_batch(items):
+            batches.append(items)
+            return [item != "bad" for item in items]
+        
+        async def run():
+            batcher = OutboundBatcher(send_batch, max_batch=10, flush_interval=0.05)
+            results = await asyncio.gather(*(batcher.submit(item) for item in ("a", "bad", "c")))
+            await batcher.close()
+            return results
+        
+        assert asyncio.run(run()) == [True, False, True]
+        assert batches == [["a", "bad", "c"]]
+    
+    def test_close_sends_batch_held_by_flusher(self):
+        """Test that close() sends items the flusher already took off the queue"""
+        batches = []
+        
+        async def send_batch(items):
+            batches.append(items)
+            return [True] * len(items)
+        
+        async def run():
+            batcher = OutboundBatcher(send_batch, max_batch=10, flush_interval=10)
+            submitted = asyncio.create_task(batcher.submit("a"))
+            await asyncio.sleep(0.05)
+            await batcher.close()
+            return await asyncio.wait_for(submitted, 1)
+        
+        assert asyncio.run(run()) is True
+        assert batches == [["a"]]
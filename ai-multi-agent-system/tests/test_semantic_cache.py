@@ -0,0 +1,44 @@
+"""
+Test suite for Semantic Cache
+"""
+import pytest
+from utils.semantic_cache import SemanticCache
+
+
+class TestSemanticCache:
+    """Test cases for Semantic Cache"""
+    
+    @pytest.fixture
+    def cache(self):
+        """Create a small semantic cache"""
+        return SemanticCache(threshold=0.9, max_entries=2)
+    
+    def test_exact_match_is_normalized(self, cache):
+        """Test that exact lookups ignore case and whitespace differences"""
+        cache.put_exact("What is the  status of my claim?", {"action_id": "claim_status"})
+        
+        assert cache.get_exact("what is the status of my CLAIM?") == {"action_id": "claim_status"}
+        assert cache.get_exact("I want to submit a claim") is None
+    
+    def test_similarity_search(self, cache):
+        """Test that only embeddings above the threshold match"""
+        cache.add([1.0, 0.0, 0.0], "claim_status")
+        
+        value, similarity = cache.search([0.99, 0.05, 0.0])
+        assert value == "claim_status"
+        assert similarity > 0.9
+        assert cache.search([0.0, 1.0, 0.0]) is None
+    
+    def test_oldest_entries_are_evicted(self, cache):
+        """Test that the cache stays bounded"""
+        cache.add([1.0, 0.0], "first")
+        cache.add([0.0, 1.0], "second")
+        cache.add([-1.0, 0.0], "third")
+        
+        assert len(cache) == 2
+        assert cache.search([1.0, 0.0]) is None
+        assert cache.search([-1.0, 0.0])[0] == "third"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,28 @@
+"""
+Test suite for text utilities
+"""
+from utils.text import preprocess_content
+
+
+class TestPreprocessContent:
+    """Test cases for preprocess_content"""
+    
+    def test_strips_quotes_and_signature(self):
+        """Test that quoted replies and the signature block are removed"""
+        text = (
+            "Please check my claim CLM-123.\n"
+            "\n\n\n"
+            "On Mon, 1 Jan 2024, Support <support@example.com> wrote:\n"
+            "> We received your claim.\n"
+            ">> Original message\n"
+            "--\n"
+            "John Doe\n"
+            "Policy POL-1"
+        )
+        
+        assert preprocess_content(text) == "Please check my claim CLM-123."
+    
+    def test_truncates(self):
+        """Test that content is cut at max_chars"""
+        assert preprocess_content("a" * 50, max_chars=10) == "a" * 10
+        assert preprocess_content(None) == ""
@@ -1,4 +1,9 @@
 """Utils package initialization"""
 from .logger import get_logger, setup_logger
+from .cache import LRUCache, prompt_key
+from .dedup import BoundedSet, RollingBloomFilter, create_dedup_filter, fast_message_id
+from .text import preprocess_content
+from .clock import iso_from_unix, utcnow_iso
+from .circuit_breaker import CircuitBreaker
 
-__all__ = ["get_logger", "setup_logger"]
+__all__ = ["get_logger", "setup_logger", "LRUCache", "prompt_key", "BoundedSet", "RollingBloomFilter", "create_dedup_filter", "fast_message_id", "preprocess_content", "iso_from_unix", "utcnow_iso", "CircuitBreaker"]
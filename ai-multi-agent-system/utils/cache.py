@@ -0,0 +1,53 @@
+"""
+Cache Utility
+Bounded LRU cache with optional TTL, and hashing of rendered prompts into cache keys
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+def prompt_key(prompt: str) -> str:
+    """Hash a fully-rendered prompt into a compact cache key"""
+    return hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry"""
+    
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default when missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            
+            stored_at, value = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return default
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+    
+    def __len__(self) -> int:
+        return len(self._data)
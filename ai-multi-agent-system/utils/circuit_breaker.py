@@ -0,0 +1,62 @@
+"""
+Circuit Breaker Utility
+Short-circuits calls to a failing dependency until a cooldown has passed
+"""
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+    
+    After failure_threshold failures in a row the circuit opens and calls are
+    refused for cooldown seconds. Once the cooldown has passed the circuit is
+    half-open: a single trial call is let through while the others are still refused.
+    A failed trial reopens the circuit, a successful one closes it. A trial that
+    never reports back stops blocking after another cooldown.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        """True while the circuit is cooling down after opening"""
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+    
+    def allow_request(self) -> bool:
+        """Return whether a call may be attempted now, claiming the trial slot when half-open"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            if self._trial_started_at is not None and now - self._trial_started_at < self.cooldown:
+                return False
+            
+            self._trial_started_at = now
+            return True
+    
+    def record_success(self):
+        """Close the circuit and reset the failure count"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started_at = None
+    
+    def record_failure(self):
+        """Count a failure, opening (or reopening) the circuit at the threshold"""
+        with self._lock:
+            self._failures += 1
+            self._trial_started_at = None
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
@@ -0,0 +1,42 @@
+"""
+Clock Utility
+Cheap ISO-8601 timestamp formatting for message parsing
+"""
+import time
+from functools import lru_cache
+from typing import Any, Optional
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+# Messages in a burst mostly share a handful of distinct seconds
+@lru_cache(maxsize=256)
+def _format_utc_second(second: int) -> str:
+    return time.strftime(ISO_FORMAT, time.gmtime(second))
+
+
+def utcnow_iso() -> str:
+    """Current UTC time as an ISO-8601 string, formatted once per second"""
+    return _format_utc_second(int(time.time()))
+
+
+def iso_from_unix(ts: Any) -> Optional[str]:
+    """
+    Format a unix timestamp (int or digit string) as a UTC ISO-8601 string
+    
+    Args:
+        ts: Unix timestamp in seconds
+    
+    Returns:
+        ISO-8601 string, or None if ts is not a valid timestamp
+    """
+    if not isinstance(ts, (int, str)):
+        return None
+    
+    try:
+        second = int(ts)
+        if second < 0:
+            return None
+        return _format_utc_second(second)
+    except (ValueError, OverflowError, OSError):
+        return None
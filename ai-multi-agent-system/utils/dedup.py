@@ -0,0 +1,135 @@
+"""
+Deduplication Utility
+Bounded structures for remembering already-processed message identifiers
+"""
+import math
+from collections import OrderedDict
+from typing import Hashable, List, Union
+import xxhash
+
+
+def fast_message_id(message_id: str) -> int:
+    """
+    Compact 64-bit key for a channel message id, for internal deduplication
+    
+    Channel ids (Teams activity GUIDs, WhatsApp wamids, Message-ID headers) are
+    long strings; dedup structures store this hash instead and the canonical id
+    stays only in the standardized message.
+    """
+    return xxhash.xxh3_64_intdigest(str(message_id).encode())
+
+
+class BoundedSet:
+    """Set that keeps at most maxlen keys, evicting the oldest first"""
+    
+    def __init__(self, maxlen: int = 50000):
+        self.maxlen = maxlen
+        self._data: "OrderedDict[Hashable, None]" = OrderedDict()
+    
+    def add(self, key: Hashable):
+        """Add a key, refreshing its position if already present"""
+        self._data[key] = None
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxlen:
+            self._data.popitem(last=False)
+    
+    def check_and_add(self, key: Hashable) -> bool:
+        """
+        Record a key and report whether it was already present
+        
+        Args:
+            key: Message identifier, or its fast_message_id
+        
+        Returns:
+            True if the key was already present, False if it is new
+        """
+        seen = key in self._data
+        self.add(key)
+        return seen
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RollingBloomFilter:
+    """
+    Fixed-memory "seen before?" filter for message identifiers
+    
+    Two Bloom filter generations are kept; once the current one holds capacity
+    keys it becomes the previous generation and a fresh one takes over. Keys are
+    remembered for at least capacity insertions, memory stays constant, and the
+    false-positive rate stays around fpr (a false positive drops a new message
+    as a duplicate).
+    """
+    
+    def __init__(self, capacity: int = 100000, fpr: float = 1e-6):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(fpr) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._current = bytearray((self.num_bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+    
+    def check_and_add(self, key: Union[str, int]) -> bool:
+        """
+        Record a key and report whether it had (probably) been seen before
+        
+        Args:
+            key: Message identifier, or its fast_message_id
+        
+        Returns:
+            True if the key was already present, False if it is new
+        """
+        positions = self._positions(key)
+        if self._contains(self._current, positions):
+            return True
+        
+        seen = self._contains(self._previous, positions)
+        
+        if self._count >= self.capacity:
+            self._previous, self._current = self._current, bytearray(len(self._current))
+            self._count = 0
+        
+        for pos in positions:
+            self._current[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+        
+        return seen
+    
+    def __contains__(self, key: Union[str, int]) -> bool:
+        positions = self._positions(key)
+        return self._contains(self._current, positions) or self._contains(self._previous, positions)
+    
+    def _positions(self, key: Union[str, int]) -> List[int]:
+        """Bit positions for a key, by double hashing the two halves of its 64-bit hash"""
+        digest = key if isinstance(key, int) else fast_message_id(key)
+        h1 = digest & 0xFFFFFFFF
+        h2 = (digest >> 32) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+    
+    @staticmethod
+    def _contains(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in positions)
+
+
+def create_dedup_filter(strategy: str = "bloom", capacity: int = 50000) -> Union[RollingBloomFilter, BoundedSet]:
+    """
+    Create the processed-message filter for a channel handler
+    
+    Args:
+        strategy: "bloom" for the fixed-memory RollingBloomFilter, or "exact" for a
+            BoundedSet with no false positives (for when dropping a new message as a
+            duplicate is unacceptable)
+        capacity: Number of recent message ids to remember
+    
+    Returns:
+        A filter with check_and_add and membership tests
+    """
+    if strategy == "exact":
+        return BoundedSet(capacity)
+    if strategy == "bloom":
+        return RollingBloomFilter(capacity)
+    raise ValueError(f"Unknown dedup strategy: {strategy}")
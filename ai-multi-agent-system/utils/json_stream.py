@@ -0,0 +1,65 @@
+"""
+JSON Stream Utility
+Incremental parsing of JSON text that arrives in pieces (e.g. streamed LLM output)
+"""
+import json
+import re
+from typing import Any, List
+
+SEPARATOR_PATTERN = re.compile(r'[\s,]*')
+
+
+class JSONArrayStreamParser:
+    """
+    Extract the items of an array field from streamed JSON text as soon as each item is complete
+    
+    Intended for arrays of objects or strings; a bare number at the end of the
+    buffer could be decoded before all of its digits have arrived.
+    """
+    
+    def __init__(self, key: str):
+        self._start_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+    
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add a piece of text and return the array items completed by it
+        
+        Args:
+            text: Next piece of the JSON document
+        
+        Returns:
+            List of newly completed items, in array order
+        """
+        self._buffer += text
+        items = []
+        
+        if not self._in_array:
+            match = self._start_pattern.search(self._buffer)
+            if not match:
+                return items
+            self._buffer = self._buffer[match.end():]
+            self._in_array = True
+        
+        while not self.done:
+            pos = SEPARATOR_PATTERN.match(self._buffer).end()
+            if pos >= len(self._buffer):
+                break
+            
+            if self._buffer[pos] == ']':
+                self.done = True
+                break
+            
+            try:
+                item, end = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Item not complete yet; wait for more text
+                break
+            
+            items.append(item)
+            self._buffer = self._buffer[end:]
+        
+        return items
@@ -0,0 +1,82 @@
+"""
+Semantic Cache
+In-memory cache of LLM results with exact and embedding-similarity lookups
+"""
+import threading
+from typing import Any, Optional, Sequence, Tuple
+import numpy as np
+from .cache import LRUCache, prompt_key
+
+
+class SemanticCache:
+    """
+    Two-tier cache for LLM results
+    - L0: exact match on whitespace/case-normalized text
+    - L1: nearest neighbour by cosine similarity over stored embeddings
+    Both tiers are bounded; the oldest entries are evicted first.
+    """
+    
+    def __init__(self, threshold: float = 0.92, max_entries: int = 10000, ttl: Optional[float] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._exact = LRUCache(maxsize=max_entries, ttl=ttl)
+        self._vectors: Optional[np.ndarray] = None
+        self._values: list = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text for exact matching"""
+        return " ".join(text.lower().split())
+    
+    def get_exact(self, text: str) -> Optional[Any]:
+        """Return the value stored for this exact (normalized) text, if any"""
+        return self._exact.get(prompt_key(self.normalize(text)))
+    
+    def put_exact(self, text: str, value: Any):
+        """Store a value for this exact (normalized) text"""
+        self._exact.set(prompt_key(self.normalize(text)), value)
+    
+    def search(self, embedding: Sequence[float]) -> Optional[Tuple[Any, float]]:
+        """
+        Find the most similar stored embedding
+        
+        Args:
+            embedding: Query embedding
+        
+        Returns:
+            Tuple of (value, similarity) when the best match reaches the threshold, else None
+        """
+        query = self._unit(embedding)
+        with self._lock:
+            if self._size == 0:
+                return None
+            similarities = self._vectors[:self._size] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                return None
+            return self._values[best], similarity
+    
+    def add(self, embedding: Sequence[float], value: Any):
+        """Store a value under its embedding, overwriting the oldest entry when full"""
+        vector = self._unit(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        """Convert an embedding to a float32 unit vector so a dot product is cosine similarity"""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -0,0 +1,42 @@
+"""
+Text Utility
+Trims message bodies down to the part worth sending to the LLM
+"""
+import re
+
+# "On Mon, 1 Jan 2024, Jane <jane@example.com> wrote:" reply headers
+REPLY_HEADER_PATTERN = re.compile(r'^On .* wrote:\s*$')
+# Standard "-- " signature delimiter (trailing space often stripped by clients)
+SIGNATURE_DELIMITER_PATTERN = re.compile(r'^--\s*$')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+DEFAULT_MAX_CHARS = 1000
+
+
+def preprocess_content(text: str, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """
+    Strip quoted replies and signatures from a message body and truncate it
+    
+    Args:
+        text: Raw message content
+        max_chars: Maximum number of characters to keep
+    
+    Returns:
+        Cleaned, truncated content for use in LLM prompts
+    """
+    if not text:
+        return ""
+    
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        # Everything after the signature delimiter is signature
+        if SIGNATURE_DELIMITER_PATTERN.match(stripped):
+            break
+        # Skip quoted lines and the header introducing them
+        if stripped.startswith('>') or REPLY_HEADER_PATTERN.match(stripped):
+            continue
+        lines.append(line.rstrip())
+    
+    content = BLANK_LINES_PATTERN.sub('\n\n', '\n'.join(lines)).strip()
+    return content[:max_chars]